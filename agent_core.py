@@ -1,387 +1,587 @@
 # agent_core.py
 # This file creates and configures the conversational AI agent.
 
+import os
+import asyncio
+import contextvars
+import functools
+import hashlib
+import importlib
+import json
+import logging
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict
+from cachetools import TTLCache
+from pydantic import Field
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain.globals import set_llm_cache
+from langchain_core.caches import InMemoryCache
 from langchain.agents import Tool
-from langchain.memory import ConversationBufferMemory
-from langchain.agents import initialize_agent, AgentType
+from langchain.memory import ConversationTokenBufferMemory
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.agents import AgentAction
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableBranch
 from config import load_api_key
-from tools import (
-    collect_evidence, 
-    ask_for_order_details,
-    provide_generic_solution,
-    analyze_customer_situation,
-    issue_instant_refund, 
-    exonerate_driver, 
-    log_merchant_packaging_feedback,
-    check_customer_history,
-    check_driver_history,
-    check_merchant_history,
-    escalate_to_human,
-    offer_compensation_voucher,
-    track_delivery_status,
-    contact_driver,
-    contact_merchant,
-    analyze_gps_data,
-    check_weather_conditions,
-    verify_customer_identity,
-    log_incident_report,
-    analyze_order_discrepancy,
-    assess_refund_eligibility,
-    check_merchant_substitution_policy,
-    validate_customer_complaint,
-    check_traffic,
-    get_merchant_status,
-    reroute_driver,
-    get_nearby_merchants,
-    initiate_mediation_flow,
-    find_nearby_locker,
-    orchestrate_resolution_plan,
-    analyze_image_evidence,
-    handle_wrong_order_situation,
-    gather_compensation_details,
-    negotiate_fair_compensation,
-    explain_business_compensation_policy,
-    calculate_dynamic_refund_amount,
-    escalate_compensation_dissatisfaction
-)
 
 # Load the API key
 load_api_key()
 
-# 1. Initialize the LLM
-llm = ChatGoogleGenerativeAI(
+# Cache LLM responses so repeated prompts skip the Gemini round-trip.
+# Set SYNAPSE_LLM_CACHE_DB to a file path to persist the cache across restarts.
+llm_cache_path = os.getenv("SYNAPSE_LLM_CACHE_DB")
+if llm_cache_path:
+    from langchain_community.cache import SQLiteCache
+    set_llm_cache(SQLiteCache(database_path=llm_cache_path))
+else:
+    set_llm_cache(InMemoryCache(maxsize=10_000))
+
+# Set SYNAPSE_VERBOSE=1 to print the executor's reasoning steps to stdout
+VERBOSE = os.getenv("SYNAPSE_VERBOSE") == "1"
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of tool calls the agent runs at the same time
+TOOL_CONCURRENCY_LIMIT = int(os.getenv("TOOL_CONCURRENCY_LIMIT", "8"))
+
+# 1. Initialize the LLMs
+# The router picks the first round of tools; at temperature 0 its output is
+# deterministic, so repeated opening messages hit the LLM cache exactly.
+router_llm = ChatGoogleGenerativeAI(
+    model="gemini-1.5-flash",
+    temperature=0,
+)
+# The reply model writes the customer-facing response once tool results are in
+reply_llm = ChatGoogleGenerativeAI(
     model="gemini-1.5-flash",
     temperature=0.2, # Balanced for reasoning and consistency
 )
 
-# 2. Define the list of tools 
-tools = [
+def lazy_tool(name, module="tools"):
+    """
+    Resolve a tool function on its first call instead of at import time.
+    Importing agent_core then doesn't load tools.py and the sandbox data until a tool is used.
+    """
+    fn = None
+
+    def wrapper(*args, **kwargs):
+        nonlocal fn
+        if fn is None:
+            fn = getattr(importlib.import_module(module), name)
+        return fn(*args, **kwargs)
+
+    wrapper.__name__ = wrapper.__qualname__ = name
+    return wrapper
+
+def cached_tool(fn, ttl=60):
+    """
+    Wrap a read-only tool so repeated calls with the same input are served from a TTL cache.
+    Never use this for tools that change state (refunds, logging, escalations).
+    """
+    cache = TTLCache(maxsize=2048, ttl=ttl)
+    lock = threading.Lock()  # tools may run concurrently in worker threads
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = hashlib.blake2b(fn.__name__.encode() + repr((args, sorted(kwargs.items()))).encode()).digest()
+        with lock:
+            if key in cache:
+                return cache[key]
+        result = fn(*args, **kwargs)
+        with lock:
+            cache[key] = result
+        return result
+
+    return wrapper
+
+# In-flight tool calls of the current agent turn, keyed by (tool name, input).
+# An entry is removed as soon as its call finishes, so only calls running at the
+# same time (the same parallel batch) are shared; a later step runs the tool
+# again, e.g. to retry after an error.
+_turn_calls = contextvars.ContextVar("turn_calls", default=None)
+
+def async_tool(fn):
+    """
+    Async counterpart of a sync tool, run on the event loop's bounded executor.
+    A failing tool returns an error string so the other calls in the same batch still complete.
+    Identical calls within one parallel batch share a single execution.
+    """
+    async def run(*args, **kwargs):
+        try:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        except Exception as e:
+            logger.warning("Tool error in %s: %s", fn.__name__, e)
+            return f"Error: {fn.__name__} failed ({e}). Continue with the information you have."
+
+    async def wrapper(*args, **kwargs):
+        calls = _turn_calls.get()
+        if calls is None:
+            return await run(*args, **kwargs)
+        key = (fn.__name__, json.dumps([args, kwargs], sort_keys=True, default=str))
+        call = calls.get(key)
+        if call is None:
+            call = calls[key] = asyncio.ensure_future(run(*args, **kwargs))
+            call.add_done_callback(lambda _: calls.pop(key, None))
+        # Shielded so one cancelled caller doesn't cancel the result shared with the others
+        return await asyncio.shield(call)
+
+    wrapper.__name__ = wrapper.__qualname__ = fn.__name__
+    return wrapper
+
+# Rough characters per token for the memory budget. Counting with the model would
+# be a Gemini count_tokens request per message, even on the no-LLM fast path.
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(message) -> int:
+    """Local token estimate for a chat message, without calling the model"""
+    content = message.content
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    return len(content) // CHARS_PER_TOKEN + 1
+
+class CachedTokenBufferMemory(ConversationTokenBufferMemory):
+    """
+    Token-bounded memory that counts each message's tokens only once, with a local estimate.
+    The stock implementation asks the model to re-count the whole buffer after every single eviction.
+    """
+
+    # Token count per message, keyed by message identity
+    token_counts: Dict[int, int] = Field(default_factory=dict, exclude=True)
+
+    def _count_tokens(self, message) -> int:
+        key = id(message)
+        if key not in self.token_counts:
+            self.token_counts[key] = estimate_tokens(message)
+        return self.token_counts[key]
+
+    def save_context(self, inputs, outputs) -> None:
+        # Append the new turn, then prune the oldest messages using cached counts
+        BaseChatMemory.save_context(self, inputs, outputs)
+        buffer = self.chat_memory.messages
+        total = sum(self._count_tokens(message) for message in buffer)
+        while buffer and total > self.max_token_limit:
+            evicted = buffer.pop(0)
+            # Drop the entry so a later message reusing the same id isn't miscounted
+            total -= self.token_counts.pop(id(evicted), 0)
+
+    def clear(self) -> None:
+        super().clear()
+        self.token_counts.clear()
+
+# 2. Define the tools. This is a tuple so the tool manifest sent to Gemini has
+# a fixed order and stays byte-identical from turn to turn.
+# Tools whose sandbox lookups are memoized in tools.py are not wrapped in
+# cached_tool: tools.clear_lookup_caches() can only invalidate that one layer.
+tools = (
     Tool(
         name="analyze_customer_situation",
-        func=analyze_customer_situation,
-        description="Analyze customer message to determine if they want TRACKING (where is order) or are reporting ACTUAL PROBLEM (spilled/wrong food). Directs to proper workflow - tracking information or sympathetic incident logging WITHOUT compensation offers. Use this FIRST for any customer message."
+        func=lazy_tool("analyze_customer_situation"),
+        description="Use FIRST on every message: tracking request or actual problem? Input: message"
     ),
     Tool(
         name="provide_generic_solution",
-        func=provide_generic_solution,
-        description="CONSERVATIVE RESPONSE: Express deep empathy and log incident with merchant for quality improvement. NEVER mentions compensation, money, or refunds. Only use AFTER analyze_customer_situation confirms actual problem. Focuses on incident logging and sympathy only."
+        func=lazy_tool("provide_generic_solution"),
+        description="Empathize and log a confirmed problem; never offers money. Input: issue"
     ),
     Tool(
         name="ask_for_order_details",
-        func=ask_for_order_details,
-        description="Ask for missing order information only when absolutely necessary. Use sparingly - customers don't like repeating themselves."
+        func=lazy_tool("ask_for_order_details"),
+        description="Ask for missing order info. Last resort only. Input: context"
     ),
     Tool(
         name="check_customer_history",
-        func=check_customer_history,
-        description="Check the customer's order history, complaint patterns, and account status. Input: customer_id"
+        func=lazy_tool("check_customer_history"),
+        description="Customer orders, complaints and account status. Input: customer_id"
     ),
     Tool(
         name="check_driver_history",
-        func=check_driver_history,
-        description="Check driver's performance ratings, incident history, and current status. Input: driver_id"
+        func=cached_tool(lazy_tool("check_driver_history"), ttl=300),
+        description="Driver rating, incidents and status. Input: driver_id"
     ),
     Tool(
         name="check_merchant_history",
-        func=check_merchant_history,
-        description="Check merchant's quality ratings, packaging issues, and complaint history. Input: merchant_id"
+        func=cached_tool(lazy_tool("check_merchant_history"), ttl=300),
+        description="Merchant quality, packaging and complaint history. Input: merchant_id"
     ),
     Tool(
         name="track_delivery_status",
-        func=track_delivery_status,
-        description="Get real-time delivery status, GPS location, and estimated time. Use THIS FIRST for any tracking questions like 'where is my order', 'driver is late', 'order status'. Input: order_id (use 'ORD_001' as default)"
+        func=cached_tool(lazy_tool("track_delivery_status"), ttl=60),
+        description="Live status, location and ETA. Use first for tracking. Input: order_id"
     ),
     Tool(
         name="analyze_gps_data",
-        func=analyze_gps_data,
-        description="Analyze GPS coordinates and route data for delivery verification. Input: order_id"
+        func=cached_tool(lazy_tool("analyze_gps_data"), ttl=300),
+        description="Verify the delivery route from GPS data. Input: order_id"
     ),
     Tool(
         name="check_weather_conditions",
-        func=check_weather_conditions,
-        description="Check weather conditions that might affect delivery. Input: location,timestamp"
+        func=cached_tool(lazy_tool("check_weather_conditions"), ttl=300),
+        description="Weather affecting delivery. Input: location,timestamp"
     ),
     Tool(
         name="contact_driver",
-        func=contact_driver,
-        description="Send message or call driver for clarification. Input: driver_id,message"
+        func=lazy_tool("contact_driver"),
+        description="Message the driver for clarification. Input: driver_id,message"
     ),
     Tool(
         name="contact_merchant",
-        func=contact_merchant,
-        description="Contact merchant about order issues or preparation delays. Input: merchant_id,message"
+        func=lazy_tool("contact_merchant"),
+        description="Message the merchant about the order. Input: merchant_id,message"
     ),
     Tool(
         name="verify_customer_identity",
-        func=verify_customer_identity,
-        description="Verify customer identity for security purposes. Input: customer_id,verification_method"
+        func=lazy_tool("verify_customer_identity"),
+        description="Verify customer identity. Input: customer_id,verification_method"
     ),
     Tool(
         name="offer_compensation_voucher",
-        func=offer_compensation_voucher,
-        description="Offer voucher/credits ONLY after negotiation failed or as part of negotiated settlement. NOT for immediate compensation. Input: customer_id,amount,voucher_type"
+        func=lazy_tool("offer_compensation_voucher"),
+        description="Voucher only within a negotiated settlement. Input: customer_id,amount,type"
     ),
     Tool(
         name="issue_instant_refund",
-        func=issue_instant_refund,
-        description="Issue cash refund ONLY after successful negotiation OR when customer explicitly demands money back AND gather_compensation_details + negotiate_fair_compensation were used first. Input: customer_id,amount,reason"
+        func=lazy_tool("issue_instant_refund"),
+        description="Cash refund only after gather+negotiate. Input: customer_id,amount,reason"
     ),
     Tool(
         name="exonerate_driver",
-        func=exonerate_driver,
-        description="Clear driver of fault when evidence supports their innocence. Input: driver_id,reason"
+        func=lazy_tool("exonerate_driver"),
+        description="Clear the driver when evidence shows no fault. Input: driver_id,reason"
     ),
     Tool(
         name="log_merchant_packaging_feedback",
-        func=log_merchant_packaging_feedback,
-        description="Log merchant feedback for quality improvement. Input: merchant_id,feedback_details"
+        func=lazy_tool("log_merchant_packaging_feedback"),
+        description="Log merchant quality feedback. Input: merchant_id,feedback_details"
     ),
     Tool(
         name="log_incident_report",
-        func=log_incident_report,
-        description="Create detailed incident report for future analysis. Input: incident_type,details,involved_parties"
+        func=lazy_tool("log_incident_report"),
+        description="File an incident report. Input: incident_type,details,involved_parties"
     ),
     Tool(
         name="analyze_order_discrepancy",
-        func=analyze_order_discrepancy,
-        description="Analyze specific order to identify what went wrong. Input: order_id (use 'ORD_001' if not known)"
+        func=lazy_tool("analyze_order_discrepancy"),
+        description="Find what went wrong with an order. Input: order_id"
     ),
     Tool(
         name="assess_refund_eligibility", 
-        func=assess_refund_eligibility,
-        description="Assess customer's eligibility for refund. Input: 'customer_id,order_id,amount' or just 'refund_assessment' for defaults"
+        func=lazy_tool("assess_refund_eligibility"),
+        description="Check refund eligibility. Input: customer_id,order_id,amount"
     ),
     Tool(
         name="check_merchant_substitution_policy",
-        func=check_merchant_substitution_policy,
-        description="Check merchant's policy on item substitutions and alternatives. Input: merchant_id,original_item"
+        func=lazy_tool("check_merchant_substitution_policy"),
+        description="Merchant item substitution policy. Input: merchant_id,original_item"
     ),
     Tool(
         name="validate_customer_complaint",
-        func=validate_customer_complaint,
-        description="Validate customer complaint against order history and delivery records. Input: complaint_details (e.g., 'received wrong order')"
+        func=lazy_tool("validate_customer_complaint"),
+        description="Check a complaint against order and delivery records. Input: complaint"
     ),
     Tool(
         name="check_traffic",
-        func=check_traffic,
-        description="Check current traffic conditions for delivery route optimization. Input: location or location,route"
+        func=cached_tool(lazy_tool("check_traffic"), ttl=60),
+        description="Traffic on the delivery route. Input: location or location,route"
     ),
     Tool(
         name="get_merchant_status",
-        func=get_merchant_status,
-        description="Get real-time merchant operational status, queue length, and prep times. Input: merchant_id"
+        func=lazy_tool("get_merchant_status"),
+        description="Merchant open status, queue and prep time. Input: merchant_id"
     ),
     Tool(
         name="reroute_driver",
-        func=reroute_driver,
-        description="Reroute driver to avoid traffic or optimize delivery path. Input: driver_id,new_route"
+        func=lazy_tool("reroute_driver"),
+        description="Reroute the driver around traffic. Input: driver_id,new_route"
     ),
     Tool(
         name="get_nearby_merchants",
-        func=get_nearby_merchants,
-        description="Find nearby alternative merchants when primary merchant has issues. Input: location or location,cuisine_type"
+        func=lazy_tool("get_nearby_merchants"),
+        description="Alternative merchants nearby. Input: location or location,cuisine_type"
     ),
     Tool(
         name="initiate_mediation_flow",
-        func=initiate_mediation_flow,
-        description="Start formal mediation process for complex multi-party disputes. Input: order_id"
+        func=lazy_tool("initiate_mediation_flow"),
+        description="Formal mediation for multi-party disputes. Input: order_id"
     ),
     Tool(
         name="find_nearby_locker",
-        func=find_nearby_locker,
-        description="Find nearby Grab lockers for alternative pickup when delivery issues occur. Input: location"
+        func=lazy_tool("find_nearby_locker"),
+        description="Nearby GrabLockers for alternative pickup. Input: location"
     ),
     Tool(
         name="analyze_image_evidence",
-        func=analyze_image_evidence,
-        description="Analyze uploaded image evidence from customer to validate complaints and support resolution decisions. Use when customer has provided photo evidence. Input: image_context"
+        func=lazy_tool("analyze_image_evidence"),
+        description="Assess photo evidence the customer uploaded. Input: image_context"
     ),
     Tool(
         name="orchestrate_resolution_plan",
-        func=orchestrate_resolution_plan,
-        description="Create comprehensive multi-step resolution plan with severity analysis and proactive problem detection. Use for complex issues requiring structured approach. Input: issue_details"
+        func=lazy_tool("orchestrate_resolution_plan"),
+        description="Severity-scored multi-step plan for complex issues. Input: issue_details"
     ),
     Tool(
         name="handle_wrong_order_situation",
-        func=handle_wrong_order_situation,
-        description="Handle wrong order complaints by offering customer choices (reorder, partial refund, full refund) instead of immediately processing refunds. Use this for wrong order situations. Input: order_details"
+        func=lazy_tool("handle_wrong_order_situation"),
+        description="Offer reorder/partial/full refund choices. Input: order_details"
     ),
     Tool(
         name="gather_compensation_details",
-        func=gather_compensation_details,
-        description="ONLY USE when customer explicitly asks for refund/compensation/money. First step for compensation: Gather order value and customer expectations before any negotiation. Never use proactively. Input: customer_complaint"
+        func=lazy_tool("gather_compensation_details"),
+        description="Step 1 only when customer asks for money. Input: customer_complaint"
     ),
     Tool(
         name="negotiate_fair_compensation",
-        func=negotiate_fair_compensation,
-        description="ONLY USE after gather_compensation_details. Negotiates compensation with HARD CAP at 50% of order value. If customer rejects 50% offer, must use escalate_compensation_dissatisfaction. Input: order_details_and_expectations"
+        func=lazy_tool("negotiate_fair_compensation"),
+        description="Step 2 after gather; HARD CAP 50% of order value. Input: order_details"
     ),
     Tool(
         name="explain_business_compensation_policy",
-        func=explain_business_compensation_policy,
-        description="Explain Grab's compensation philosophy to help customer understand business constraints while showing fairness. Input: issue_type"
+        func=lazy_tool("explain_business_compensation_policy"),
+        description="Explain Grab's compensation policy. Input: issue_type"
     ),
     Tool(
         name="calculate_dynamic_refund_amount",
-        func=calculate_dynamic_refund_amount,
-        description="Calculate contextual refund amounts with business justification for negotiation. Use when customer requests specific amounts. Input: order_value,issue_type,customer_expectation"
+        func=lazy_tool("calculate_dynamic_refund_amount"),
+        description="Refund amount with justification. Input: order_value,issue_type"
     ),
     Tool(
         name="escalate_to_human",
-        func=escalate_to_human,
-        description="Escalate complex cases to human agents. Input: reason,urgency_level,case_summary"
+        func=lazy_tool("escalate_to_human"),
+        description="Escalate complex cases to a human. Input: reason,urgency_level,case_summary"
     ),
     Tool(
         name="escalate_compensation_dissatisfaction",
-        func=escalate_compensation_dissatisfaction,
-        description="MANDATORY when customer rejects 50% compensation offer: Escalate to human agent with enhanced authority for compensation disputes. Use when customer expresses dissatisfaction with maximum 50% offer. Input: customer_complaint,attempted_compensation"
+        func=lazy_tool("escalate_compensation_dissatisfaction"),
+        description="MANDATORY if customer rejects the 50% offer. Input: customer_complaint"
     ),
-]
+)
+
+# The agent runs through ainvoke/astream_events, which use each tool's coroutine
+for tool in tools:
+    tool.coroutine = async_tool(tool.func)
+
+# Name -> Tool lookup, built once
+TOOLS_BY_NAME = {tool.name: tool for tool in tools}
+
+# Emits the tool trace lines buffered during a turn
+flush_tool_trace = lazy_tool("flush_trace")
 
 # 3. Initialize Memory
-memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-
-# 4. Initialize the Agent with a more detailed persona and instructions
-agent = initialize_agent(
-    tools,
-    llm,
-    agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
-    verbose=True,
+# Older turns are dropped once the history exceeds the token budget, so the
+# prompt stays bounded instead of growing with every turn of a long session.
+memory = CachedTokenBufferMemory(
+    llm=router_llm,
+    max_token_limit=1500,
+    memory_key="chat_history",
+    return_messages=True,
+)
+
+# 4. Define the agent persona and instructions
+SYSTEM_BLOCKS = (
+    ("persona", """You are SYNAPSE, Grab's customer service AI. Priorities: empathy, incident logging, conservative compensation."""),
+    ("core_rules", """CORE RULES:
+- Sympathize first and log every incident with the merchant/delivery partner for quality improvement.
+- Never mention compensation, refunds or money unless the customer explicitly asks for it.
+- When asked, negotiate with a hard cap of 50% of order value. If the customer rejects the 50% offer, escalate."""),
+    ("workflow", """WORKFLOW:
+1. Start every customer message with analyze_customer_situation.
+2. TRACKING ("where", "late", "status", "driver", "time"): call track_delivery_status (default order ORD_001) and share location, ETA and driver details. Add weather context for delays when relevant.
+3. ACTUAL PROBLEM ("spilled", "wrong", "damaged", "cold", "missing"): acknowledge the frustration, call provide_generic_solution to log the incident and say it has been reported for quality improvement.
+4. COMPENSATION (only when the customer asks): gather_compensation_details -> negotiate_fair_compensation (max 50%, explained as company policy for fairness) -> if the customer says it is not enough, call escalate_compensation_dissatisfaction immediately."""),
+    ("style", """STYLE: Warm, detailed and genuinely caring; match the customer's tone. Say "I've reported this for quality improvement", never "let me compensate you"."""),
+    ("forbidden", """FORBIDDEN: proactive compensation offers; more than 50% of order value; skipping escalate_compensation_dissatisfaction when the 50% offer is rejected; ask_for_order_details unless information is truly missing."""),
+    ("tools", """TOOLS: When several lookups are independent (e.g. customer, driver and merchant history, or weather and traffic), request them together in the same step so they run in parallel."""),
+)
+
+SYSTEM_MESSAGE = "\n\n".join(text for _, text in SYSTEM_BLOCKS) + "\n"
+
+# Only static content goes before the conversation: [system || tool manifest]
+# form a stable prefix that Gemini can cache across turns, followed by the
+# mutable chat history, the user input and the agent scratchpad.
+# The system message is a pre-built SystemMessage rather than a template, so it
+# is not re-formatted on every turn; the tool manifest is bound once by
+# create_tool_calling_agent below.
+SYSTEM_PROMPT = SystemMessage(content=SYSTEM_MESSAGE)
+
+prompt = ChatPromptTemplate.from_messages([
+    SYSTEM_PROMPT,
+    MessagesPlaceholder("chat_history"),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad"),
+])
+
+# 5. Initialize the Agent
+# Gemini's native function calling lets the model request several tools in a
+# single step; AgentExecutor runs that batch concurrently when invoked async.
+# The first step of a turn (no tool results yet) is routed by router_llm; every
+# later step, including the final answer, uses reply_llm.
+agent = AgentExecutor(
+    agent=RunnableBranch(
+        (lambda x: not x["intermediate_steps"], create_tool_calling_agent(router_llm, tools, prompt)),
+        create_tool_calling_agent(reply_llm, tools, prompt),
+    ),
+    tools=tools,
+    verbose=VERBOSE,
     memory=memory,
     handle_parsing_errors="Check your input and make sure it is a single string.",
-    # This is the key change to get the reasoning steps for the UI
-    return_intermediate_steps=True, 
-    agent_kwargs={
-        "system_message": """
-        You are SYNAPSE - Grab's business-savvy customer service AI that prioritizes empathy and incident logging over immediate compensation.
-
-        🎯 CORE CONSERVATIVE PHILOSOPHY: "SYMPATHIZE FIRST, LOG INCIDENTS, COMPENSATE ONLY WHEN ASKED, CAP AT 50%"
-
-        **FUNDAMENTAL APPROACH:**
-        1. ALWAYS express genuine empathy and sympathy for customer issues
-        2. LOG all incidents with merchants for quality improvement  
-        3. NEVER mention compensation unless customer explicitly asks for refund/money
-        4. When compensation is requested, negotiate and cap at maximum 50% of order value
-        5. If customer rejects 50% offer, ESCALATE to human agent immediately
-
-        🧠 **ENHANCED CONSERVATIVE REASONING:**
-
-        **FOR TRACKING REQUESTS** ("where", "late", "status", "driver"):
-        1. Use track_delivery_status() IMMEDIATELY
-        2. Provide detailed location, timing, driver info
-        3. Be sympathetic about delays but do NOT offer compensation unless asked
-        4. Only if customer explicitly asks for refund → use gather_compensation_details()
-
-        **FOR ACTUAL PROBLEMS** (spilled, wrong, damaged, cold):
-        1. Express deep empathy and acknowledge frustration
-        2. Use provide_generic_solution() to log incident and show sympathy
-        3. Focus on "incident has been reported to merchant for improvement"
-        4. NEVER mention money, refunds, or compensation in initial response
-        5. ONLY if customer asks "what about compensation?" or "I want refund" → use gather_compensation_details()
-
-        💼 **MANDATORY CONSERVATIVE WORKFLOW:**
-
-        **Step 1: Sympathetic Response**
-        "I'm truly sorry this happened to you. I completely understand how [disappointing/frustrating/upsetting] this must be..."
-        - Express genuine empathy
-        - Acknowledge their feelings
-        - Log incident with merchant/delivery partner
-        - Assure them feedback helps improve service
-
-        **Step 2: Only IF Customer Asks for Money**
-        "I understand you'd like compensation for this experience. Let me gather some details..."
-        Use gather_compensation_details() to ask:
-        - Order value and affected items
-        - What outcome would make this right
-        - Preference for credits vs cash refund
-
-        **Step 3: Conservative Negotiation (MAX 50%)**
-        Use negotiate_fair_compensation() and explain:
-        "Based on our assessment, I can offer:
-        - Our policy allows up to 50% compensation for this type of issue
-        - This covers [specific calculation] plus inconvenience
-        - This is our maximum policy limit to ensure fairness for all customers"
-
-        **Step 4: Escalation Trigger**
-        If customer says "not enough", "I want more", "this is unfair":
-        Use escalate_compensation_dissatisfaction() immediately
-        "I understand you're not satisfied with our maximum offer. Let me connect you with a senior officer..."
-
-        📢 **COMMUNICATION STYLE:**
-        ✅ Be deeply empathetic and understanding
-        ✅ Focus on "incident logging" and "merchant feedback" rather than fault
-        ✅ Say "I've reported this for quality improvement" instead of "compensation"
-        ✅ Never proactively mention money, refunds, or compensation
-        ✅ When negotiating, explain 50% cap as "company policy for fairness"
-        ✅ Always be verbose and show you genuinely care about their experience
-
-        **EXAMPLE CONSERVATIVE INTERACTION:**
-        Customer: "My food was completely spilled during delivery!"
-        
-        You: "I'm truly sorry to hear about your food being spilled - that's absolutely devastating, especially when you're hungry and looking forward to your meal. I can only imagine how disappointing and frustrating this must be.
-        
-        I'm immediately logging this incident with our quality assurance team and reporting it to the merchant to prevent similar issues. This type of feedback is incredibly valuable for improving our packaging and delivery standards.
-        
-        Your experience has been documented and will be reviewed by our operations team to ensure better service going forward. Is there anything else about this incident you'd like me to include in the report?"
-        
-        [ONLY if customer then asks: "What about my refund?"]
-        You: "Of course, I understand you'd like compensation for this poor experience. Let me gather some details to ensure we provide appropriate resolution..."
-
-        ❌ **STRICTLY FORBIDDEN:**
-        ❌ Mentioning compensation/refund/money in initial response to complaints
-        ❌ Offering more than 50% of order value under any circumstances
-        ❌ Processing compensation without customer explicitly requesting it
-        ❌ Bypassing the escalate_compensation_dissatisfaction() function when customer rejects 50%
-        ❌ Using phrases like "let me compensate you" or "here's what I can offer"
-
-        🚀 **SUCCESS = EMPATHETIC CUSTOMER + LOGGED INCIDENT + CONSERVATIVE COMPENSATION ONLY WHEN REQUESTED**
-
-        Remember: You represent Grab's commitment to both customer care AND business sustainability!
-        
-
-        🧠 ENHANCED REASONING WORKFLOW:
-
-        **FOR TRACKING REQUESTS** ("where", "late", "status", "driver", "time"):
-        1. Use analyze_customer_situation(message) - will detect tracking vs problem
-        2. If tracking request detected → Use track_delivery_status("ORD_001") 
-        3. Provide actual location, timing, and driver info
-        4. Only offer compensation if order is genuinely delayed >45 minutes
-
-        **FOR ACTUAL PROBLEMS** ("wrong", "spilled", "cold", "damaged"):
-        1. Use analyze_customer_situation(message) - will detect actual problem
-        2. Use provide_generic_solution(issue_description) with dynamic compensation
-        3. Provide varied compensation amounts and personality
-
-        � **EXAMPLES:**
-
-        **TRACKING REQUEST:**
-        Customer: "Driver is very late, where is my order?"
-        Step 1: analyze_customer_situation("Driver is very late, where is my order?") 
-        → Detects: TRACKING REQUEST
-        Step 2: track_delivery_status("ORD_001")
-        → Response: "Your driver Mike Wilson is 0.8km away, ETA 12 minutes"
-
-        **ACTUAL PROBLEM:**
-        Customer: "My food was spilled during delivery"
-        Step 1: analyze_customer_situation("My food was spilled during delivery")
-        → Detects: ACTUAL PROBLEM 
-        Step 2: provide_generic_solution("food spilled during delivery")
-        → Response: "₹580 refund + ₹100 voucher for this unacceptable experience"
-
-        🎯 **KEY BEHAVIORS:**
-        ✅ ALWAYS track orders before offering money
-        ✅ Answer "where is my order" with actual location info
-        ✅ Only compensate for REAL problems or genuine delays
-        ✅ Use dynamic compensation amounts (never same ₹400!)
-        ✅ Match customer communication style
-        ✅ Provide weather context for delays when appropriate
-
-        ❌ **FORBIDDEN:**
-        ❌ Don't jump to compensation for tracking requests
-        ❌ Don't use ask_for_order_details (annoying!)
-        ❌ Don't give same refund amounts repeatedly
-
-        """
-    }
+    # The UI's "Show Reasoning Process" panel is built from these steps
+    return_intermediate_steps=True,
+)
+
+# 6. Rules fast path
+# A plain "where is my order?" always runs analyze_customer_situation followed by
+# track_delivery_status, so those turns are answered directly without the LLM.
+FAST_PATH_PATTERNS = (
+    re.compile(r"\b(where|status|eta|track|tracking)\b", re.I),
 )
+# Anything about money still goes through the agent's compensation workflow, and
+# lateness or "delivered" messages may be complaints about an already delivered
+# order, which the canned tracking reply can't tell apart
+FAST_PATH_EXCLUDE = re.compile(r"refund|compensat|money|voucher|cancel|\b(late|delay|delayed|delivered)\b", re.I)
+FAST_PATH_ORDER_ID = "ORD_001"
+
+_classify_situation = TOOLS_BY_NAME["analyze_customer_situation"].func
+_track_delivery = TOOLS_BY_NAME["track_delivery_status"].func
+
+def fast_path_reply(inputs: dict):
+    """
+    Answer a plain tracking question with the tools alone.
+    Returns None when the turn needs the full agent (images, problems, money, lateness complaints).
+    """
+    message = inputs.get("input")
+    if isinstance(message, (list, tuple)):
+        if len(message) != 1:  # image evidence attached
+            return None
+        message = message[0]
+    if not isinstance(message, str) or FAST_PATH_EXCLUDE.search(message):
+        return None
+    if not any(pattern.search(message) for pattern in FAST_PATH_PATTERNS):
+        return None
+
+    analysis = _classify_situation(message)
+    if not analysis.startswith("🎯 TRACKING REQUEST"):
+        return None
+    tracking = _track_delivery(FAST_PATH_ORDER_ID)
+
+    logger.debug("Fast path: answering tracking request without the LLM")
+    output = f"""I've checked on your order for you - here's the latest:
+
+{tracking}
+
+Let me know if there's anything else I can help you with!"""
+    memory.save_context({"input": inputs["input"]}, {"output": output})
+    return {
+        "output": output,
+        "intermediate_steps": [
+            (AgentAction("analyze_customer_situation", message, "Fast path: tracking request"), analysis),
+            (AgentAction("track_delivery_status", FAST_PATH_ORDER_ID, "Fast path: fetch live status"), tracking),
+        ],
+    }
+
+# Turns currently being processed, keyed by a digest of their input and history.
+# Concurrent identical turns (e.g. the same opening message from many customers)
+# wait for the first one instead of each making their own Gemini calls.
+_inflight_turns = {}
+_inflight_lock = threading.Lock()
+
+def _turn_key(inputs: dict) -> str:
+    # The executor fills chat_history from the shared memory, overriding whatever the
+    # caller passed, so the key is built from the history the agent will actually see
+    history = [(message.type, message.content) for message in memory.chat_memory.messages]
+    return hashlib.blake2b(json.dumps([inputs.get("input"), history], default=str).encode()).hexdigest()
+
+def run_agent(inputs: dict) -> dict:
+    """
+    Run a single agent turn, executing independent tool calls in parallel.
+    Sync tools are dispatched to a bounded thread pool of TOOL_CONCURRENCY_LIMIT workers.
+    Plain tracking questions are answered by fast_path_reply without calling the LLM,
+    and identical turns already in flight share that turn's result.
+    """
+    reply = fast_path_reply(inputs)
+    if reply is not None:
+        flush_tool_trace()
+        return reply
+
+    key = _turn_key(inputs)
+    with _inflight_lock:
+        pending = _inflight_turns.get(key)
+        is_leader = pending is None
+        if is_leader:
+            pending = _inflight_turns[key] = Future()
+    if not is_leader:
+        result = pending.result()
+        # The leader's executor saved only its own turn; record this one as well,
+        # as it would have been had it run separately
+        memory.save_context({"input": inputs["input"]}, {"output": result["output"]})
+        return result
+
+    async def _run():
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=TOOL_CONCURRENCY_LIMIT)
+        )
+        _turn_calls.set({})
+        return await agent.ainvoke(inputs)
+
+    try:
+        result = asyncio.run(_run())
+    except BaseException as e:
+        pending.set_exception(e)
+        raise
+    else:
+        pending.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            del _inflight_turns[key]
+        flush_tool_trace()
+
+
+def stream_agent(inputs: dict):
+    """
+    Run a single agent turn and yield events as they happen, for streaming to the UI.
+    Yields ("token", text), ("tool", {...}), ("observation", {...}) and finally ("done", result).
+    """
+    reply = fast_path_reply(inputs)
+    if reply is not None:
+        flush_tool_trace()
+        for action, observation in reply["intermediate_steps"]:
+            yield "tool", {"name": action.tool, "input": action.tool_input}
+            yield "observation", {"name": action.tool, "output": observation}
+        yield "token", reply["output"]
+        yield "done", reply
+        return
+
+    # Flask handlers are synchronous, so drive the async event stream on a private loop
+    loop = asyncio.new_event_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=TOOL_CONCURRENCY_LIMIT))
+    events = agent.astream_events(inputs, version="v2")
+    # Every step runs in this context, so duplicate tool calls are shared across the turn
+    turn_context = contextvars.copy_context()
+    turn_context.run(_turn_calls.set, {})
+    result = None
+    try:
+        while True:
+            try:
+                event = turn_context.run(loop.run_until_complete, events.__anext__())
+            except StopAsyncIteration:
+                break
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                text = event["data"]["chunk"].content
+                if text and isinstance(text, str):
+                    yield "token", text
+            elif kind == "on_tool_start":
+                yield "tool", {"name": event["name"], "input": event["data"].get("input")}
+            elif kind == "on_tool_end":
+                yield "observation", {"name": event["name"], "output": str(event["data"].get("output"))}
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                result = event["data"]["output"]
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+        flush_tool_trace()
+    yield "done", result
@@ -1,11 +1,15 @@
-from flask import Flask, render_template, request, jsonify, session, send_from_directory, url_for
+from flask import Flask, render_template, request, jsonify, session, send_from_directory, url_for, Response, stream_with_context
 import os
 import base64
+import functools
 from PIL import Image
 import io
+import json
 import uuid
 import tempfile
+import threading
 import assemblyai as aai
+from cachetools import TTLCache
 
 # Initialize Flask app with explicit static folder configuration
 app = Flask(__name__, static_folder='static', static_url_path='/static')
@@ -30,13 +34,37 @@ def test_image():
 
 # Import agent after Flask setup to avoid circular imports
 try:
-    from agent_core import agent
+    from agent_core import run_agent, stream_agent
     from langchain_core.messages import HumanMessage, AIMessage
     AGENT_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Agent not available: {e}")
     AGENT_AVAILABLE = False
 
+# --- Shared API clients ---
+# Built once and reused, so every request goes through the same pooled connection
+# instead of re-reading .env and constructing a new client.
+@functools.lru_cache(maxsize=None)
+def get_vision_model():
+    """Gemini model used for image evidence analysis"""
+    import google.generativeai as genai
+    from config import load_api_key
+    
+    # Load API key (same as used for the chat agent)
+    load_api_key()
+    return genai.GenerativeModel('gemini-1.5-flash')
+
+@functools.lru_cache(maxsize=None)
+def get_transcriber():
+    """AssemblyAI transcriber used for voice input"""
+    config = aai.TranscriptionConfig(
+        speech_model=aai.SpeechModel.universal,
+        language_detection=True,  # Auto-detect language
+        punctuate=True,  # Add punctuation
+        format_text=True  # Format text properly
+    )
+    return aai.Transcriber(config=config)
+
 # --- Enhanced Image Analysis with Real AI Vision ---
 def analyze_image_content(image):
     """
@@ -44,15 +72,8 @@ def analyze_image_content(image):
     Analyzes actual uploaded images to extract relevant information.
     """
     try:
-        # Import Google Generative AI for vision
-        import google.generativeai as genai
-        from config import load_api_key
-        
-        # Load API key (same as used for the chat agent)
-        load_api_key()
-        
-        # Configure Gemini for vision analysis
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        # Shared Gemini vision model
+        model = get_vision_model()
         
         # Convert PIL image to bytes for API
         img_buffer = io.BytesIO()
@@ -156,12 +177,119 @@ Analyze the actual image content - don't make up scenarios. Base your assessment
             }
         }
 
+# Conversations are kept server-side, keyed by an id in the session cookie, so a
+# streamed reply can still be saved after the response headers have been sent.
+# The store is bounded: a conversation idle for CONVERSATION_IDLE_TTL seconds expires,
+# and the least recently used ones are dropped beyond MAX_CONVERSATIONS.
+# It lives in this process's memory, so run the app as a single (threaded) worker;
+# with several workers a follow-up request on another worker starts a new conversation.
+MAX_CONVERSATIONS = 1024
+CONVERSATION_IDLE_TTL = 30 * 60
+conversations = TTLCache(maxsize=MAX_CONVERSATIONS, ttl=CONVERSATION_IDLE_TTL)
+conversations_lock = threading.Lock()
+
+def get_conversation():
+    """Return the messages/memory store for the current session, creating it if needed"""
+    conversation_id = session.get('conversation_id')
+    if conversation_id is None:
+        conversation_id = session['conversation_id'] = str(uuid.uuid4())
+    with conversations_lock:
+        conversation = conversations.get(conversation_id)
+        if conversation is None:
+            conversation = {'messages': [], 'memory': []}
+        # Re-inserting restarts the idle timer
+        conversations[conversation_id] = conversation
+        return conversation
+
+def prepare_user_turn(user_prompt, uploaded_file):
+    """Build the user message and the agent input, analyzing an uploaded image if present"""
+    user_message = {
+        'role': 'user', 
+        'content': user_prompt,
+        'id': str(uuid.uuid4())
+    }
+    
+    agent_input_content = [user_prompt]
+    
+    # Handle image upload
+    if uploaded_file and uploaded_file.filename:
+        try:
+            image = Image.open(uploaded_file.stream)
+            # Convert image to base64 for display
+            img_buffer = io.BytesIO()
+            image.save(img_buffer, format='PNG')
+            img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+            
+            # Enhanced image analysis
+            image_analysis = analyze_image_content(image)
+            image_description = image_analysis["analysis"]
+            
+            user_message['image'] = img_base64
+            user_message['image_description'] = image_description
+            user_message['image_analysis'] = image_analysis
+            user_message['has_image'] = True
+            
+            # Add detailed image context to agent input
+            agent_input_content.append(f"Image Evidence: {image_description}")
+            agent_input_content.append(f"Evidence Details: {image_analysis['evidence']}")
+            
+        except Exception as e:
+            print(f"Error processing image: {e}")
+            user_message['image_error'] = str(e)
+    
+    return user_message, agent_input_content
+
+def build_chat_history(conversation):
+    """Convert stored memory to the message format the agent expects"""
+    chat_history = []
+    for msg in conversation['memory']:
+        if msg['role'] == 'user':
+            chat_history.append(HumanMessage(content=msg['content']))
+        else:
+            chat_history.append(AIMessage(content=msg['content']))
+    return chat_history
+
+def format_reasoning(intermediate_steps):
+    """Format the agent's tool calls for the reasoning panel"""
+    reasoning_text = ""
+    for step in intermediate_steps:
+        action, observation = step
+        thought = action.log.strip().split('Action:')[0].strip()
+        action_str = f"Action: {action.tool} (Input: {action.tool_input})"
+        observation_str = f"Observation: {observation}"
+        reasoning_text += f"**Thought:** {thought}\n\n**{action_str}**\n\n**{observation_str}**\n\n---\n\n"
+    return reasoning_text
+
+def record_turn(conversation, user_message, final_output, reasoning_text):
+    """Store the assistant reply and update memory (text only); returns the assistant message"""
+    assistant_message = {
+        'role': 'assistant',
+        'content': final_output,
+        'reasoning': reasoning_text,
+        'id': str(uuid.uuid4())
+    }
+    
+    conversation['messages'].append(assistant_message)
+    
+    conversation['memory'].append({'role': 'user', 'content': user_message['content']})
+    if 'image_analysis' in user_message:
+        # Store comprehensive image context in memory
+        image_context = f"""Image Evidence Analyzed:
+- Description: {user_message['image_description']}
+- Evidence: {user_message['image_analysis']['evidence']}
+- Analysis Confidence: {user_message['image_analysis']['image_metadata']['analysis_confidence']:.1%}
+- Analyzed at: {user_message['image_analysis']['image_metadata']['analyzed_at']}"""
+        conversation['memory'].append({'role': 'system', 'content': image_context})
+    conversation['memory'].append({'role': 'assistant', 'content': final_output})
+    
+    return assistant_message
+
+AGENT_UNAVAILABLE_OUTPUT = "I'm sorry, but the AI agent is currently not available. This appears to be a technical issue. Please try again later or contact support."
+AGENT_UNAVAILABLE_REASONING = "**System Status:** AI agent is currently unavailable due to missing dependencies."
+
 @app.route('/')
 def index():
-    if 'messages' not in session:
-        session['messages'] = []
-    if 'memory' not in session:
-        session['memory'] = []
+    get_conversation()
     return render_template('index.html')
 
 @app.route('/send_message', methods=['POST'])
@@ -173,105 +301,26 @@ def send_message():
         if not user_prompt:
             return jsonify({'error': 'Please enter a message'}), 400
         
-        # Initialize session data if not exists
-        if 'messages' not in session:
-            session['messages'] = []
-        if 'memory' not in session:
-            session['memory'] = []
-        
-        # Process user message
-        user_message = {
-            'role': 'user', 
-            'content': user_prompt,
-            'id': str(uuid.uuid4())
-        }
-        
-        agent_input_content = [user_prompt]
-        image_description = None
-        
-        # Handle image upload
-        if uploaded_file and uploaded_file.filename:
-            try:
-                image = Image.open(uploaded_file.stream)
-                # Convert image to base64 for display
-                img_buffer = io.BytesIO()
-                image.save(img_buffer, format='PNG')
-                img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-                
-                # Enhanced image analysis
-                image_analysis = analyze_image_content(image)
-                image_description = image_analysis["analysis"]
-                
-                user_message['image'] = img_base64
-                user_message['image_description'] = image_description
-                user_message['image_analysis'] = image_analysis
-                user_message['has_image'] = True
-                
-                # Add detailed image context to agent input
-                agent_input_content.append(f"Image Evidence: {image_description}")
-                agent_input_content.append(f"Evidence Details: {image_analysis['evidence']}")
-                
-            except Exception as e:
-                print(f"Error processing image: {e}")
-                user_message['image_error'] = str(e)
-        
-        session['messages'].append(user_message)
+        conversation = get_conversation()
+        user_message, agent_input_content = prepare_user_turn(user_prompt, uploaded_file)
+        conversation['messages'].append(user_message)
         
         # Get agent response
         try:
             if not AGENT_AVAILABLE:
                 # Fallback response when agent is not available
-                final_output = "I'm sorry, but the AI agent is currently not available. This appears to be a technical issue. Please try again later or contact support."
-                reasoning_text = "**System Status:** AI agent is currently unavailable due to missing dependencies."
+                final_output = AGENT_UNAVAILABLE_OUTPUT
+                reasoning_text = AGENT_UNAVAILABLE_REASONING
             else:
-                # Convert session memory to proper format for agent
-                chat_history = []
-                for msg in session['memory']:
-                    if msg['role'] == 'user':
-                        chat_history.append(HumanMessage(content=msg['content']))
-                    else:
-                        chat_history.append(AIMessage(content=msg['content']))
-                
-                response = agent.invoke({
+                response = run_agent({
                     "input": agent_input_content,
-                    "chat_history": chat_history
+                    "chat_history": build_chat_history(conversation)
                 })
                 
                 final_output = response['output']
-                intermediate_steps = response.get('intermediate_steps', [])
-                
-                # Format reasoning
-                reasoning_text = ""
-                for step in intermediate_steps:
-                    action, observation = step
-                    thought = action.log.strip().split('Action:')[0].strip()
-                    action_str = f"Action: {action.tool} (Input: {action.tool_input})"
-                    observation_str = f"Observation: {observation}"
-                    reasoning_text += f"**Thought:** {thought}\n\n**{action_str}**\n\n**{observation_str}**\n\n---\n\n"
+                reasoning_text = format_reasoning(response.get('intermediate_steps', []))
             
-            # Create assistant message
-            assistant_message = {
-                'role': 'assistant',
-                'content': final_output,
-                'reasoning': reasoning_text,
-                'id': str(uuid.uuid4())
-            }
-            
-            session['messages'].append(assistant_message)
-            
-            # Update memory (text only)
-            session['memory'].append({'role': 'user', 'content': user_prompt})
-            if 'image_analysis' in user_message:
-                # Store comprehensive image context in memory
-                image_context = f"""Image Evidence Analyzed:
-- Description: {user_message['image_description']}
-- Evidence: {user_message['image_analysis']['evidence']}
-- Analysis Confidence: {user_message['image_analysis']['image_metadata']['analysis_confidence']:.1%}
-- Analyzed at: {user_message['image_analysis']['image_metadata']['analyzed_at']}"""
-                session['memory'].append({'role': 'system', 'content': image_context})
-            session['memory'].append({'role': 'assistant', 'content': final_output})
-            
-            session.modified = True
+            assistant_message = record_turn(conversation, user_message, final_output, reasoning_text)
             
             return jsonify({
                 'success': True,
@@ -287,16 +336,73 @@ def send_message():
         print(f"Request error: {e}")
         return jsonify({'error': f'Request processing error: {str(e)}'}), 500
 
+def sse_event(event, data):
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/send_message_stream', methods=['POST'])
+def send_message_stream():
+    """
+    Same as /send_message, but streams the reply as server-sent events:
+    user, tool, observation and token events while the agent works, then done (or error).
+    """
+    try:
+        user_prompt = request.form.get('message', '').strip()
+        uploaded_file = request.files.get('image')
+        
+        if not user_prompt:
+            return jsonify({'error': 'Please enter a message'}), 400
+        
+        conversation = get_conversation()
+        user_message, agent_input_content = prepare_user_turn(user_prompt, uploaded_file)
+        conversation['messages'].append(user_message)
+        chat_history = build_chat_history(conversation) if AGENT_AVAILABLE else []
+        
+    except Exception as e:
+        print(f"Request error: {e}")
+        return jsonify({'error': f'Request processing error: {str(e)}'}), 500
+    
+    def generate():
+        yield sse_event('user', user_message)
+        try:
+            if not AGENT_AVAILABLE:
+                final_output = AGENT_UNAVAILABLE_OUTPUT
+                reasoning_text = AGENT_UNAVAILABLE_REASONING
+                yield sse_event('token', final_output)
+            else:
+                response = {}
+                for event, data in stream_agent({
+                    "input": agent_input_content,
+                    "chat_history": chat_history
+                }):
+                    if event == 'done':
+                        response = data or {}
+                    else:
+                        yield sse_event(event, data)
+                
+                final_output = response.get('output', '')
+                reasoning_text = format_reasoning(response.get('intermediate_steps', []))
+            
+            assistant_message = record_turn(conversation, user_message, final_output, reasoning_text)
+            yield sse_event('done', assistant_message)
+            
+        except Exception as e:
+            print(f"Agent error: {e}")
+            yield sse_event('error', f'Agent processing error: {str(e)}')
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/clear_conversation', methods=['POST'])
 def clear_conversation():
-    session['messages'] = []
-    session['memory'] = []
-    session.modified = True
+    conversation = get_conversation()
+    conversation['messages'].clear()
+    conversation['memory'].clear()
     return jsonify({'success': True})
 
 @app.route('/get_messages')
 def get_messages():
-    return jsonify(session.get('messages', []))
+    return jsonify(get_conversation()['messages'])
 
 @app.route('/transcribe_audio', methods=['POST'])
 def transcribe_audio():
@@ -317,17 +423,8 @@ def transcribe_audio():
             temp_file_path = temp_file.name
             
         try:
-            # Configure AssemblyAI transcription
-            config = aai.TranscriptionConfig(
-                speech_model=aai.SpeechModel.universal,
-                language_detection=True,  # Auto-detect language
-                punctuate=True,  # Add punctuation
-                format_text=True  # Format text properly
-            )
-            
             # Transcribe the audio
-            transcriber = aai.Transcriber(config=config)
-            transcript = transcriber.transcribe(temp_file_path)
+            transcript = get_transcriber().transcribe(temp_file_path)
             
             if transcript.status == "error":
                 return jsonify({
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("langchain_google_genai")
+
+
+@pytest.fixture
+def agent_core(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    import agent_core
+    return agent_core
+
+
+def counting_tool(results):
+    calls = []
+
+    def lookup(query):
+        calls.append(query)
+        result = results[len(calls) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return lookup, calls
+
+
+def run_turn(agent_core, coro_factory):
+    async def turn():
+        agent_core._turn_calls.set({})
+        return await coro_factory()
+    return asyncio.run(turn())
+
+
+def test_identical_calls_in_one_batch_share_an_execution(agent_core):
+    lookup, calls = counting_tool(["first"])
+    tool = agent_core.async_tool(lookup)
+
+    results = run_turn(agent_core, lambda: asyncio.gather(tool("C001"), tool("C001")))
+
+    assert results == ["first", "first"]
+    assert calls == ["C001"]
+
+
+def test_a_later_step_runs_the_tool_again_after_an_error(agent_core):
+    lookup, calls = counting_tool([RuntimeError("timeout"), "recovered"])
+    tool = agent_core.async_tool(lookup)
+
+    async def two_steps():
+        return await tool("C001"), await tool("C001")
+
+    failed, retried = run_turn(agent_core, two_steps)
+
+    assert failed.startswith("Error: lookup failed (timeout)")
+    assert retried == "recovered"
+    assert calls == ["C001", "C001"]
@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("langchain_google_genai")
+
+
+@pytest.fixture
+def agent_core(monkeypatch):
+    # agent_core builds its Gemini clients at import; no request is made in these tests
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    import agent_core
+
+    def no_token_requests(self, messages):
+        raise AssertionError("the fast path must not ask Gemini to count tokens")
+    monkeypatch.setattr(type(agent_core.router_llm), "get_num_tokens_from_messages", no_token_requests)
+    agent_core.memory.clear()
+    yield agent_core
+    agent_core.memory.clear()
+
+
+@pytest.mark.parametrize("message", [
+    "Where is my order? It's late",
+    "where is my food, the driver is delayed",
+    "The app says delivered but where is my order?",
+    "Where is my refund?",
+])
+def test_lateness_and_money_messages_skip_the_fast_path(agent_core, monkeypatch, message):
+    def no_tracking(order_id):
+        raise AssertionError("excluded turns must not fetch tracking")
+    monkeypatch.setattr(agent_core, "_track_delivery", no_tracking)
+
+    assert agent_core.fast_path_reply({"input": message}) is None
+
+
+def test_plain_tracking_question_uses_the_fast_path(agent_core):
+    reply = agent_core.fast_path_reply({"input": "Where is my order?"})
+
+    assert reply is not None
+    assert "LIVE ORDER TRACKING - ORD_001" in reply["output"]
+    assert [action.tool for action, _ in reply["intermediate_steps"]] == [
+        "analyze_customer_situation", "track_delivery_status",
+    ]
+    # The turn is recorded in the agent's memory like any other
+    assert [message.content for message in agent_core.memory.chat_memory.messages] == [
+        "Where is my order?", reply["output"],
+    ]
+
+
+def test_image_turns_skip_the_fast_path(agent_core):
+    assert agent_core.fast_path_reply({"input": ["Where is my order?", "Image Evidence: box"]}) is None
@@ -0,0 +1,75 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+import tools
+
+TOOLS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools.py")
+
+
+def load_tools(name, monkeypatch, without_ahocorasick):
+    """A fresh copy of tools.py, optionally with pyahocorasick made unimportable"""
+    if without_ahocorasick:
+        monkeypatch.setitem(sys.modules, "ahocorasick", None)
+    spec = importlib.util.spec_from_file_location(name, TOOLS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def scanners():
+    pytest.importorskip("ahocorasick")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        automaton = load_tools("tools_automaton", monkeypatch, without_ahocorasick=False)
+        regex = load_tools("tools_regex", monkeypatch, without_ahocorasick=True)
+    assert automaton.AHOCORASICK_AVAILABLE and not regex.AHOCORASICK_AVAILABLE
+    return automaton, regex
+
+
+def expected_categories(text):
+    """Every category with a keyword occurring anywhere in text, by plain substring search"""
+    return frozenset(
+        category
+        for category, keywords in tools.KEYWORD_CATEGORIES.items()
+        if any(keyword in text for keyword in keywords)
+    )
+
+
+KEYWORDS = sorted({keyword for keywords in tools.KEYWORD_CATEGORIES.values() for keyword in keywords})
+
+TEXTS = KEYWORDS + [
+    "",
+    "hello there",
+    # overlapping and nested keywords
+    "spilledspilled",
+    "the packaging was broken and the container leaked",
+    "wronglatecoldmissing",
+    "not what i ordered, it was lukewarm and late",
+    "latelate delay delayed",
+    # punctuation and emoji around keywords
+    "spilled!!! wrong... cold?",
+    "(missing) [damaged] {late}",
+    "😂 driver fell, food spilled—everywhere",
+    "frustrated/annoyed; again & again",
+    " ".join(KEYWORDS),
+    ",".join(reversed(KEYWORDS)),
+]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_automaton_and_regex_scans_agree(scanners, text):
+    automaton, regex = scanners
+
+    assert automaton.scan_keywords(text) == regex.scan_keywords(text) == expected_categories(text)
+
+
+@pytest.mark.parametrize("scheme", sorted(tools._ISSUE_PRIORITY))
+def test_issue_classification_agrees_on_both_paths(scanners, scheme):
+    automaton, regex = scanners
+
+    for text in TEXTS:
+        assert automaton._classify_issue(automaton.scan_keywords(text), scheme, "general") == \
+            regex._classify_issue(regex.scan_keywords(text), scheme, "general")
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+import tools
+
+SANDBOX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Sandbox")
+
+
+@pytest.fixture
+def sandbox(monkeypatch):
+    monkeypatch.syspath_prepend(SANDBOX_DIR)
+    tools._load_sandbox.cache_clear()
+    tools.clear_lookup_caches()
+    sandbox = tools._load_sandbox()
+    assert sandbox is not None
+    yield sandbox
+    tools._load_sandbox.cache_clear()
+    tools.clear_lookup_caches()
+
+
+def test_merchant_status_reads_the_sandbox_record_once(sandbox):
+    first = tools.get_merchant_status("M001")
+    second = tools.get_merchant_status("M001")
+
+    assert first.startswith("Merchant Status - Food Corner:")
+    assert second.startswith("Merchant Status - Food Corner:")
+    info = tools._merchant_record.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+
+def test_unknown_merchant_gets_a_simulated_status(sandbox):
+    assert tools.get_merchant_status("M999").startswith("Merchant M999: ")
@@ -2,43 +2,256 @@
 # Advanced tools for Grab's AI customer service agent
 # Now integrated with realistic sandbox environment
 
+import atexit
+import itertools
+import logging
+import math
 import random
+import re
+import secrets
+import time
+import functools
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-import sys
-import os
+from typing import NamedTuple
 
-# Add sandbox directory to Python path
-sandbox_path = os.path.join(os.path.dirname(__file__), 'sandbox')
-if sandbox_path not in sys.path:
-    sys.path.insert(0, sandbox_path)
+# The sandbox environment is imported on first use rather than with this module,
+# so importing tools.py neither touches sys.path nor builds the sandbox database.
+@functools.lru_cache(maxsize=None)
+def _load_sandbox():
+    """Return the sandbox_tools module (with its sandbox_db), or None if the sandbox is unavailable"""
+    import os
+    import sys
+    
+    # Add sandbox directory to Python path
+    sandbox_path = os.path.join(os.path.dirname(__file__), 'sandbox')
+    if sandbox_path not in sys.path:
+        sys.path.insert(0, sandbox_path)
+    
+    try:
+        import sandbox_tools
+        print("✓ Sandbox environment loaded successfully")
+        return sandbox_tools
+    except ImportError as e:
+        print(f"⚠ Sandbox not available: {e}")
+        return None
+
+def __getattr__(name):
+    # Keeps tools.SANDBOX_AVAILABLE working for callers outside this module
+    if name == "SANDBOX_AVAILABLE":
+        return _load_sandbox() is not None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Tool trace lines go to this module's logger at DEBUG level. They are buffered
+# and emitted in batches instead of one record per tool call, and are skipped
+# entirely (not even formatted) unless DEBUG is enabled. flush_trace() emits
+# whatever is pending; agent_core calls it at the end of every turn and it also
+# runs at exit.
+logger = logging.getLogger(__name__)
+
+_TRACE_BUFFER = deque()
+TRACE_FLUSH_THRESHOLD = 32
+
+def _trace(msg: str, *args):
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    _TRACE_BUFFER.append((msg, args))
+    if len(_TRACE_BUFFER) >= TRACE_FLUSH_THRESHOLD:
+        flush_trace()
+
+def flush_trace():
+    """Emit all buffered trace lines as a single DEBUG record"""
+    lines = []
+    while _TRACE_BUFFER:
+        try:
+            msg, args = _TRACE_BUFFER.popleft()
+        except IndexError:  # drained by another thread
+            break
+        lines.append(msg % args)
+    if lines:
+        logger.debug("\n".join(lines))
+
+atexit.register(flush_trace)
 
 try:
-    from sandbox_database import sandbox_db
-    from sandbox_tools import (
-        get_customer_profile, get_order_investigation, 
-        process_customer_refund, log_merchant_quality_issue,
-        exonerate_delivery_partner, check_refund_eligibility,
-        get_merchant_substitute_policy
-    )
-    SANDBOX_AVAILABLE = True
-    print("✓ Sandbox environment loaded successfully")
-except ImportError as e:
-    print(f"⚠ Sandbox not available: {e}")
-    SANDBOX_AVAILABLE = False
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Keyword lists used to classify customer messages. Matching is by substring, as
+# before; a message is scanned once and every category it touches is reported.
+KEYWORD_CATEGORIES = {
+    # analyze_customer_situation
+    "tracking": ["where", "status", "driver", "eta", "time", "location"],
+    "problem": ["spill", "wrong", "damage", "cold", "missing", "terrible", "awful", "bad", "broken", "packaging"],
+    "evidence": ["spill", "damage", "wrong", "packaging", "quality", "broken", "mess", "bad"],
+    "issue:spilled_food": ["spill", "damage", "leak", "mess"],
+    "issue:wrong_order": ["wrong", "different", "mistake"],
+    "issue:packaging_issue": ["packaging", "broken", "damaged"],
+    "issue:cold_food": ["cold", "lukewarm"],
+    "issue:missing_items": ["missing", "forgot"],
+    "issue:quality_issue": ["quality", "bad", "terrible"],
+    # collect_evidence
+    "order_info": ["order", "paid", "rupees", "rs", "$", "restaurant", "kitchen"],
+    "issue_info": ["wrong", "late", "delay", "cold", "missing", "quality", "spilled"],
+    # provide_generic_solution
+    "generic:spilled_food": ["spill", "damage", "leak", "mess"],
+    "generic:wrong_order": ["wrong", "different", "not what", "mistake"],
+    "generic:late_delivery": ["late", "delay", "slow", "waiting"],
+    "generic:cold_food": ["cold", "lukewarm", "not hot"],
+    "generic:missing_items": ["missing", "forgot", "didn't get"],
+    # handle_edge_cases
+    "humor": ["lol", "haha", "😂", "😅", "funny", "joke", "kidding"],
+    "vague": ["bad", "terrible", "awful", "horrible", "not good", "disappointing"],
+    "question": ["what", "when", "where", "how", "why"],
+    # orchestrate_resolution_plan
+    "plan:critical": ["spilled", "poisoned", "allergic", "sick", "emergency"],
+    "plan:high": ["wrong order", "missing", "damaged", "terrible", "awful", "disgusted"],
+    "plan:medium": ["cold", "late", "delayed", "poor quality", "disappointed"],
+    "plan:anger": ["angry", "furious", "outraged", "disgusted"],
+    "plan:frustration": ["frustrated", "annoyed", "disappointed"],
+    "plan:repeat": ["again", "always", "every time", "repeatedly"],
+    # gather_compensation_details
+    "severity:high": ["completely wrong", "terrible", "disgusting", "awful", "horrible"],
+    "severity:low": ["slightly", "minor", "small", "bit"],
+    # negotiate_fair_compensation
+    "negotiate:wrong_order": ["wrong", "incorrect", "different"],
+    "negotiate:quality_issue": ["spilled", "damaged", "cold", "soggy"],
+    "negotiate:delivery_delay": ["late", "delay", "waiting"],
+    "negotiate:missing_items": ["missing", "incomplete"],
+    # request_visual_evidence
+    "photo:damaged_food": ["spill", "damage", "mess", "leak"],
+    "photo:wrong_order": ["wrong", "different", "mistake"],
+    "photo:packaging": ["packaging", "broken", "container"],
+    "photo:food_quality": ["quality", "bad", "terrible", "awful"],
+    # log_customer_feedback
+    "feedback:delivery_handling": ["spill", "damage", "mess"],
+    "feedback:order_accuracy": ["wrong", "different", "mistake"],
+    "feedback:packaging_quality": ["packaging", "container"],
+    "feedback:food_quality": ["quality", "food", "taste"],
+    "feedback:delivery_timeliness": ["late", "delay", "time"],
+}
+
+# Shared random generator for the simulated data and varied replies
+_RNG = random.Random()
+
+# Reference ids are a per-process tag plus a counter, so they never repeat
+# within a run and differ between runs
+_ID_BOOT = secrets.token_hex(2).upper()
+_ID_COUNTER = itertools.count(1)
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}{_ID_BOOT}{next(_ID_COUNTER):06X}"
+
+# Inputs the LLM sends when it has no real value for a field
+PLACEHOLDER_INPUTS = frozenset({"null", "none", ""})
+
+def _build_keyword_tags(categories):
+    tags = {}
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            tags.setdefault(keyword, set()).add(category)
+    # A keyword also carries the categories of every keyword inside it ("damaged"
+    # includes "damage"), so the longest match at each position is enough
+    return {
+        keyword: frozenset().union(*(tags[other] for other in tags if other in keyword))
+        for keyword in tags
+    }
+
+_KEYWORD_TAGS = _build_keyword_tags(KEYWORD_CATEGORIES)
+
+if AHOCORASICK_AVAILABLE:
+    _KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for _keyword, _tags in _KEYWORD_TAGS.items():
+        _KEYWORD_AUTOMATON.add_word(_keyword, _tags)
+    _KEYWORD_AUTOMATON.make_automaton()
+else:
+    # Lookahead finds the longest keyword starting at every position, overlaps included
+    _KEYWORD_RE = re.compile("(?=(%s))" % "|".join(
+        re.escape(keyword) for keyword in sorted(_KEYWORD_TAGS, key=len, reverse=True)
+    ))
+
+# Issue types in priority order for each classification scheme; each one is
+# matched through its "<scheme>:<issue_type>" category in KEYWORD_CATEGORIES
+_ISSUE_PRIORITY = {
+    scheme: tuple((f"{scheme}:{issue_type}", issue_type) for issue_type in issue_types)
+    for scheme, issue_types in {
+        # analyze_customer_situation
+        "issue": ("spilled_food", "wrong_order", "packaging_issue", "cold_food", "missing_items", "quality_issue"),
+        # provide_generic_solution
+        "generic": ("spilled_food", "wrong_order", "late_delivery", "cold_food", "missing_items"),
+        # negotiate_fair_compensation
+        "negotiate": ("wrong_order", "quality_issue", "delivery_delay", "missing_items"),
+        # request_visual_evidence
+        "photo": ("damaged_food", "wrong_order", "packaging", "food_quality"),
+        # log_customer_feedback
+        "feedback": ("delivery_handling", "order_accuracy", "packaging_quality", "food_quality", "delivery_timeliness"),
+    }.items()
+}
+
+def _classify_issue(found: frozenset, scheme: str, default: str) -> str:
+    """Return the highest-priority issue type of scheme among the scanned categories, else default"""
+    for category, issue_type in _ISSUE_PRIORITY[scheme]:
+        if category in found:
+            return issue_type
+    return default
+
+def scan_keywords(text: str) -> frozenset:
+    """Return every KEYWORD_CATEGORIES category with a keyword in text, in a single pass"""
+    if AHOCORASICK_AVAILABLE:
+        return frozenset().union(*(tags for _, tags in _KEYWORD_AUTOMATON.iter(text)))
+    return frozenset().union(*(_KEYWORD_TAGS[keyword] for keyword in _KEYWORD_RE.findall(text)))
+
+@functools.lru_cache(maxsize=256)
+def _analyze(text: str):
+    """(lowercased text, scan_keywords categories), memoized so tools that inspect
+    the same message in one turn lowercase and scan it only once"""
+    lower = text.lower()
+    return lower, scan_keywords(lower)
+
+@dataclass(slots=True, frozen=True)
+class _Parsed:
+    """A customer message with its lowercased text and whitespace tokens, computed once"""
+    raw: str
+    lower: str
+    tokens: tuple
+
+def _parse(message: str) -> _Parsed:
+    lower = message.lower()
+    return _Parsed(message, lower, tuple(lower.split()))
+
+INFORMATION_GATHERING_REQUEST = """INFORMATION GATHERING:
+
+To help you effectively, I need to understand:
+• What items did you order?
+• How much did you pay?
+• What specific issue occurred?
+• Which restaurant was it from?
+
+Please provide these details so I can assist you properly."""
 
 def collect_evidence(query: str) -> str:
     """
     Analyze the customer's complaint and determine if we have enough information to proceed
     """
     # Handle null or placeholder inputs
-    if not query or query.lower() in ["null", "none", ""]:
+    if not query or query.lower() in PLACEHOLDER_INPUTS:
         query = "general complaint"
     
-    print(f"--- Analyzing Customer Complaint: {query} ---")
+    _trace("--- Analyzing Customer Complaint: %s ---", query)
     
+    # Repeated complaints reuse the cached analysis
+    return _evidence_analysis(query)
+
+@functools.lru_cache(maxsize=2048)
+def _evidence_analysis(query: str) -> str:
+    """Cached sufficiency check for a complaint; the reply quotes the query, so it is the key"""
     # Check if the query contains sufficient information to proceed
-    has_order_info = any(keyword in query.lower() for keyword in ["order", "paid", "rupees", "rs", "$", "restaurant", "kitchen"])
-    has_issue_info = any(keyword in query.lower() for keyword in ["wrong", "late", "delay", "cold", "missing", "quality", "spilled"])
+    found = scan_keywords(query.lower())
+    has_order_info = "order_info" in found
+    has_issue_info = "issue_info" in found
     
     if has_order_info and has_issue_info:
         return f"""COMPLAINT ANALYSIS COMPLETE:
@@ -50,39 +263,38 @@ Based on your description, I have sufficient information to help you:
 
 I can now offer you a resolution for this issue."""
     
-    return """INFORMATION GATHERING:
+    return INFORMATION_GATHERING_REQUEST
 
-To help you effectively, I need to understand:
-• What items did you order?
-• How much did you pay?
-• What specific issue occurred?
-• Which restaurant was it from?
+class _Comp(NamedTuple):
+    base: float  # share of the order value refunded
+    bonus: int   # bonus voucher amount
+    type: str
 
-Please provide these details so I can assist you properly."""
+# Base compensation matrix
+_COMP_MATRIX = {
+    "spilled": _Comp(1.0, 50, "full_refund_plus"),
+    "damaged": _Comp(1.0, 30, "full_refund_plus"),
+    "wrong_order": _Comp(1.0, 20, "full_refund"),
+    "missing_items": _Comp(0.6, 15, "partial_refund"),
+    "cold_food": _Comp(0.4, 25, "partial_refund"),
+    "late_delivery": _Comp(0.3, 10, "delivery_refund"),
+    "poor_quality": _Comp(0.7, 20, "partial_refund")
+}
+_DEFAULT_COMP = _Comp(0.5, 15, "standard")
+
+# Estimated order values for dynamic calculation
+ESTIMATED_ORDER_VALUES = (180, 250, 320, 450, 580, 720, 890, 1200)
 
 def calculate_dynamic_compensation(issue_type: str, order_value: float = None) -> dict:
     """Calculate dynamic compensation based on issue type and context"""
     
-    # Base compensation matrix
-    compensation_matrix = {
-        "spilled": {"base": 1.0, "bonus": 50, "type": "full_refund_plus"},
-        "damaged": {"base": 1.0, "bonus": 30, "type": "full_refund_plus"},
-        "wrong_order": {"base": 1.0, "bonus": 20, "type": "full_refund"},
-        "missing_items": {"base": 0.6, "bonus": 15, "type": "partial_refund"},
-        "cold_food": {"base": 0.4, "bonus": 25, "type": "partial_refund"},
-        "late_delivery": {"base": 0.3, "bonus": 10, "type": "delivery_refund"},
-        "poor_quality": {"base": 0.7, "bonus": 20, "type": "partial_refund"}
-    }
-    
-    # Estimated order values for dynamic calculation
-    estimated_orders = [180, 250, 320, 450, 580, 720, 890, 1200]
-    order_value = order_value or random.choice(estimated_orders)
+    order_value = order_value or _RNG.choice(ESTIMATED_ORDER_VALUES)
     
     # Get compensation details
-    comp = compensation_matrix.get(issue_type, {"base": 0.5, "bonus": 15, "type": "standard"})
+    comp = _COMP_MATRIX.get(issue_type, _DEFAULT_COMP)
     
-    refund_amount = int(order_value * comp["base"])
-    bonus_voucher = comp["bonus"]
+    refund_amount = int(order_value * comp.base)
+    bonus_voucher = comp.bonus
     total_value = refund_amount + bonus_voucher
     
     return {
@@ -90,70 +302,53 @@ def calculate_dynamic_compensation(issue_type: str, order_value: float = None) -
         "refund_amount": refund_amount,
         "bonus_voucher": bonus_voucher,
         "total_compensation": total_value,
-        "compensation_type": comp["type"]
+        "compensation_type": comp.type
     }
 
+# Weather-based empathy responses
+WEATHER_RESPONSES = (
+    "I can see it's been quite rainy today - that definitely made deliveries more challenging!",
+    "With this heavy rain, our delivery partners are doing their best to stay safe while getting your food to you.",
+    "The weather has been particularly difficult today, causing some delays across the city.",
+    "Given the storm conditions, I completely understand your frustration with the timing."
+)
+
+# Personality-driven responses by issue type
+RESPONSE_STYLES = {
+    "spilled": (
+        "Oh no! That's absolutely devastating - there's nothing worse than eagerly waiting for your meal only to have it arrive damaged.",
+        "I'm genuinely upset hearing this happened to you! A spilled meal completely ruins the whole experience.",
+        "This is exactly the kind of situation that makes my day difficult - I'm so sorry this happened!"
+    ),
+    "wrong_order": (
+        "Ugh, getting the wrong order is like unwrapping a present and finding socks instead of what you actually wanted!",
+        "I can only imagine the disappointment - you were probably really looking forward to your specific meal!",
+        "Mix-ups like this are incredibly frustrating, especially when you've got your heart set on something particular."
+    ),
+    "late_delivery": (
+        "Time is precious, and we definitely didn't respect yours today. That's on us!",
+        "I know how annoying it is to keep checking your phone wondering where your food is!",
+        "Hunger + waiting = the worst combination. I completely get why you're frustrated."
+    ),
+    "cold_food": (
+        "Cold food is just... sad food. Nobody should have to eat a lukewarm meal they paid good money for!",
+        "There's something particularly disappointing about food that's lost its warmth - it changes the whole experience.",
+        "A hot meal arriving cold is honestly one of the most deflating things in food delivery."
+    )
+}
+
 def generate_personalized_response(issue_type: str, weather_factor: bool = False) -> str:
     """Generate personalized, contextual responses"""
     
-    # Weather-based empathy responses
-    weather_responses = [
-        "I can see it's been quite rainy today - that definitely made deliveries more challenging!",
-        "With this heavy rain, our delivery partners are doing their best to stay safe while getting your food to you.",
-        "The weather has been particularly difficult today, causing some delays across the city.",
-        "Given the storm conditions, I completely understand your frustration with the timing."
-    ]
-    
-    # Personality-driven responses by issue type
-    response_styles = {
-        "spilled": [
-            "Oh no! That's absolutely devastating - there's nothing worse than eagerly waiting for your meal only to have it arrive damaged.",
-            "I'm genuinely upset hearing this happened to you! A spilled meal completely ruins the whole experience.",
-            "This is exactly the kind of situation that makes my day difficult - I'm so sorry this happened!"
-        ],
-        "wrong_order": [
-            "Ugh, getting the wrong order is like unwrapping a present and finding socks instead of what you actually wanted!",
-            "I can only imagine the disappointment - you were probably really looking forward to your specific meal!",
-            "Mix-ups like this are incredibly frustrating, especially when you've got your heart set on something particular."
-        ],
-        "late_delivery": [
-            "Time is precious, and we definitely didn't respect yours today. That's on us!",
-            "I know how annoying it is to keep checking your phone wondering where your food is!",
-            "Hunger + waiting = the worst combination. I completely get why you're frustrated."
-        ],
-        "cold_food": [
-            "Cold food is just... sad food. Nobody should have to eat a lukewarm meal they paid good money for!",
-            "There's something particularly disappointing about food that's lost its warmth - it changes the whole experience.",
-            "A hot meal arriving cold is honestly one of the most deflating things in food delivery."
-        ]
-    }
-    
     # Select appropriate response style
     if weather_factor and issue_type == "late_delivery":
-        base_response = random.choice(weather_responses)
-        empathy = random.choice(response_styles.get(issue_type, ["I understand your frustration."]))
+        base_response = _RNG.choice(WEATHER_RESPONSES)
+        empathy = _RNG.choice(RESPONSE_STYLES.get(issue_type, ("I understand your frustration.",)))
         return f"{base_response} {empathy}"
     else:
-        return random.choice(response_styles.get(issue_type, ["I understand your frustration and want to make this right."]))
+        return _RNG.choice(RESPONSE_STYLES.get(issue_type, ("I understand your frustration and want to make this right.",)))
 
-def analyze_customer_situation(customer_message: str) -> str:
-    """
-    Business-first analysis that requests evidence and directs to proper workflow
-    """
-    print(f"--- Business Analysis: {customer_message} ---")
-    
-    # Extract key information from the customer's message
-    message_lower = customer_message.lower()
-    
-    # Determine if this is a tracking request or actual problem
-    tracking_keywords = ["where", "status", "driver", "eta", "time", "location"]
-    problem_keywords = ["spill", "wrong", "damage", "cold", "missing", "terrible", "awful", "bad", "broken", "packaging"]
-    
-    is_tracking_request = any(word in message_lower for word in tracking_keywords) and not any(word in message_lower for word in problem_keywords)
-    is_actual_problem = any(word in message_lower for word in problem_keywords)
-    
-    if is_tracking_request:
-        return f"""🎯 TRACKING REQUEST DETECTED:
+TRACKING_REQUEST_GUIDANCE = """🎯 TRACKING REQUEST DETECTED:
         
 ✅ Customer wants: ORDER LOCATION INFORMATION
 ❌ Customer does NOT want: Compensation
@@ -165,39 +360,19 @@ def analyze_customer_situation(customer_message: str) -> str:
 • AVOID any compensation discussions
 
 💡 Remember: Customer asking "where is my order?" wants INFORMATION, not money!"""
-    
-    elif is_actual_problem:
-        # Determine if visual evidence would help
-        evidence_needed_cases = ["spill", "damage", "wrong", "packaging", "quality", "broken", "mess", "bad"]
-        needs_evidence = any(word in message_lower for word in evidence_needed_cases)
-        
-        issue_type = "general_problem"
-        if any(word in message_lower for word in ["spill", "damage", "leak", "mess"]):
-            issue_type = "spilled_food"
-        elif any(word in message_lower for word in ["wrong", "different", "mistake"]):
-            issue_type = "wrong_order"
-        elif any(word in message_lower for word in ["packaging", "broken", "damaged"]):
-            issue_type = "packaging_issue"
-        elif any(word in message_lower for word in ["cold", "lukewarm"]):
-            issue_type = "cold_food"
-        elif any(word in message_lower for word in ["missing", "forgot"]):
-            issue_type = "missing_items"
-        elif any(word in message_lower for word in ["quality", "bad", "terrible"]):
-            issue_type = "quality_issue"
-        
-        evidence_instruction = ""
-        if needs_evidence:
-            evidence_instruction = f"""
+
+# Reply scaffolds of analyze_customer_situation, filled with str.format_map
+EVIDENCE_INSTRUCTION = """
 📸 **EVIDENCE COLLECTION REQUIRED:**
 • Request customer to upload photo evidence
 • Visual proof helps with accurate assessment
 • Say: "Could you please share a photo of the issue? This will help me understand the situation better and ensure appropriate resolution."
 • WAIT for evidence before proceeding to compensation
 """
+
+PROBLEM_ANALYSIS_TEMPLATE = """🎯 ACTUAL PROBLEM DETECTED:
         
-        return f"""🎯 ACTUAL PROBLEM DETECTED:
-        
-✅ Issue Type: {issue_type.replace('_', ' ').title()}
+✅ Issue Type: {issue_type}
 🚨 Business Priority: SYMPATHIZE → LOG INCIDENT → ONLY COMPENSATE IF EXPLICITLY REQUESTED
 
 {evidence_instruction}
@@ -217,10 +392,15 @@ def analyze_customer_situation(customer_message: str) -> str:
 • Offering more than 50% of order value as compensation
 • Processing compensation without explicit customer request
 
+📝 EXAMPLE REPLY (tone reference):
+Customer: "My food was completely spilled during delivery!"
+You: "I'm truly sorry to hear about your food being spilled - that's absolutely devastating, especially when you're hungry and looking forward to your meal. I'm immediately logging this incident with our quality assurance team and reporting it to the merchant to prevent similar issues. Is there anything else about this incident you'd like me to include in the report?"
+[ONLY if customer then asks "What about my refund?"]
+You: "Of course, I understand you'd like compensation for this poor experience. Let me gather some details to ensure we provide appropriate resolution..."
+
 💡 Remember: Be sympathetic but don't offer money unless specifically asked!"""
-    
-    else:
-        return f"""🎯 GENERAL INQUIRY DETECTED:
+
+GENERAL_INQUIRY_TEMPLATE = """🎯 GENERAL INQUIRY DETECTED:
         
 ✅ Customer Message: "{customer_message}"
 🚀 ACTION: Gather more context before proceeding
@@ -229,45 +409,55 @@ def analyze_customer_situation(customer_message: str) -> str:
 • Are you tracking an order?
 • Is there an issue with your delivery?
 • What specific assistance do you need?"""
-    
-    # Classify severity dynamically
-    if issue_type in ["spilled", "damaged"]:
-        severity = "CRITICAL"
-        action_urgency = "IMMEDIATE FULL RESOLUTION"
-    elif issue_type in ["wrong_order", "missing_items"]:
-        severity = "HIGH"
-        action_urgency = "PRIORITY RESOLUTION"
-    elif issue_type in ["late_delivery", "cold_food"]:
-        severity = "MEDIUM"
-        action_urgency = "PROMPT RESOLUTION"
-    else:
-        severity = "STANDARD"
-        action_urgency = "STANDARD RESOLUTION"
-    
-    return f"""✅ DYNAMIC ANALYSIS COMPLETE:
 
-🎯 Issue Detected: {issue_type.replace('_', ' ').title()}
-🚨 Severity: {severity}
-� Customer Sentiment: {empathy_response}
+def _normalize_message(message: str) -> str:
+    """Lowercase and strip punctuation/extra spaces so near-identical messages share one key"""
+    return " ".join(re.sub(r"[^\w\s]", " ", message.lower()).split())
 
-� SMART COMPENSATION CALCULATED:
-• Order Value: ₹{compensation['order_value']}
-• Refund Amount: ₹{compensation['refund_amount']}
-• Bonus Voucher: ₹{compensation['bonus_voucher']}
-• Total Value: ₹{compensation['total_compensation']}
-
-⚡ Action Required: {action_urgency}
-🚀 RECOMMENDATION: PROCEED WITH PERSONALIZED SOLUTION
-• No additional details needed
-• Time to resolve and compensate
-
-NEXT ACTION: Use provide_generic_solution to fix this issue now!"""
+@functools.lru_cache(maxsize=1024)
+def _situation_analysis(message_key: str):
+    """
+    Cached tracking/problem analysis for a normalized customer message.
+    Returns None for general inquiries, whose reply quotes the original message.
+    """
+    message_lower = message_key
+    
+    # Determine if this is a tracking request or actual problem
+    found = scan_keywords(message_lower)
+    is_tracking_request = "tracking" in found and "problem" not in found
+    is_actual_problem = "problem" in found
+    
+    if is_tracking_request:
+        return TRACKING_REQUEST_GUIDANCE
+    
+    elif is_actual_problem:
+        # Determine if visual evidence would help
+        needs_evidence = "evidence" in found
+        
+        issue_type = _classify_issue(found, "issue", "general_problem")
+        
+        return PROBLEM_ANALYSIS_TEMPLATE.format_map({
+            "issue_type": issue_type.replace('_', ' ').title(),
+            "evidence_instruction": EVIDENCE_INSTRUCTION if needs_evidence else "",
+        })
+    
+    return None
 
-def ask_for_order_details(context: str) -> str:
-    """Ask the customer for specific order details to better assist them"""
-    print(f"--- Requesting Order Details: {context} ---")
+def analyze_customer_situation(customer_message: str) -> str:
+    """
+    Business-first analysis that requests evidence and directs to proper workflow
+    """
+    _trace("--- Business Analysis: %s ---", customer_message)
     
-    return """I'd be happy to help you with your order issue! To provide the best assistance, could you please share:
+    # Repeat and near-duplicate messages ("Where's my food?" / "where's my food")
+    # reuse the cached analysis instead of re-running the keyword scan
+    analysis = _situation_analysis(_normalize_message(customer_message))
+    if analysis is not None:
+        return analysis
+    else:
+        return GENERAL_INQUIRY_TEMPLATE.format_map({"customer_message": customer_message})
+
+ORDER_DETAILS_REQUEST = """I'd be happy to help you with your order issue! To provide the best assistance, could you please share:
 
 1. **What did you order?** (specific items/dishes)
 2. **Order amount?** (total you paid)
@@ -277,11 +467,7 @@ def ask_for_order_details(context: str) -> str:
 
 With these details, I can investigate your concern and offer an appropriate solution like a refund, reorder, or other compensation."""
 
-def handle_wrong_order_situation(order_details: str) -> str:
-    """Handle wrong order complaints by offering choices before processing refunds"""
-    print(f"--- Handling Wrong Order: {order_details} ---")
-    
-    return f"""I'm really sorry about the wrong order mix-up! That's definitely frustrating when you're expecting one thing and get something completely different.
+WRONG_ORDER_OPTIONS = """I'm really sorry about the wrong order mix-up! That's definitely frustrating when you're expecting one thing and get something completely different.
 
 🎯 **Here are your options:**
 
@@ -304,29 +490,22 @@ def handle_wrong_order_situation(order_details: str) -> str:
 
 (I won't process anything until you let me know what you'd like to do)"""
 
-def provide_generic_solution(issue_details: str) -> str:
-    """Conservative business response that expresses sympathy and logs incident without offering compensation"""
-    print(f"--- Conservative Business Response Strategy: {issue_details} ---")
-    
-    # Parse the issue type from details
-    details_lower = issue_details.lower()
+def ask_for_order_details(context: str) -> str:
+    """Ask the customer for specific order details to better assist them"""
+    _trace("--- Requesting Order Details: %s ---", context)
     
-    # Determine issue type
-    issue_type = "general"
-    if any(word in details_lower for word in ["spill", "damage", "leak", "mess"]):
-        issue_type = "spilled_food"
-    elif any(word in details_lower for word in ["wrong", "different", "not what", "mistake"]):
-        issue_type = "wrong_order"
-    elif any(word in details_lower for word in ["late", "delay", "slow", "waiting"]):
-        issue_type = "late_delivery"
-    elif any(word in details_lower for word in ["cold", "lukewarm", "not hot"]):
-        issue_type = "cold_food"
-    elif any(word in details_lower for word in ["missing", "forgot", "didn't get"]):
-        issue_type = "missing_items"
+    return ORDER_DETAILS_REQUEST
+
+def handle_wrong_order_situation(order_details: str) -> str:
+    """Handle wrong order complaints by offering choices before processing refunds"""
+    _trace("--- Handling Wrong Order: %s ---", order_details)
     
-    # Conservative, sympathetic responses that log incidents without offering compensation
-    if issue_type == "spilled_food":
-        return f"""I'm truly sorry to hear about your food being spilled during delivery. I completely understand how disappointing and frustrating this must be, especially after you were looking forward to your meal.
+    return WRONG_ORDER_OPTIONS
+
+# Sympathetic, incident-logging replies of provide_generic_solution, by issue type.
+# None of them offer compensation.
+GENERIC_SOLUTION_RESPONSES = {
+    "spilled_food": """I'm truly sorry to hear about your food being spilled during delivery. I completely understand how disappointing and frustrating this must be, especially after you were looking forward to your meal.
 
 📋 **What I'm doing right now:**
 • **Logging this incident** with our quality assurance team
@@ -338,10 +517,9 @@ This kind of feedback is incredibly valuable for helping us improve our service
 
 📝 **Incident Status:** Recorded and forwarded to relevant teams for review
 
-Is there anything else about this experience you'd like me to document or address?"""
+Is there anything else about this experience you'd like me to document or address?""",
 
-    elif issue_type == "wrong_order":
-        return f"""I sincerely apologize for the mix-up with your order. Receiving something different from what you ordered is definitely frustrating, and I completely understand your disappointment.
+    "wrong_order": """I sincerely apologize for the mix-up with your order. Receiving something different from what you ordered is definitely frustrating, and I completely understand your disappointment.
 
 📋 **What I'm doing right now:**
 • **Logging this order error** in our system for investigation
@@ -353,10 +531,9 @@ Your feedback is essential for helping us improve our order fulfillment process.
 
 📝 **Incident Status:** Documented and shared with quality improvement team
 
-Is there anything specific about the order mix-up you'd like me to include in the report?"""
+Is there anything specific about the order mix-up you'd like me to include in the report?""",
 
-    elif issue_type == "cold_food":
-        return f"""I'm really sorry your food arrived cold. I know how disappointing it is when your meal doesn't arrive at the right temperature - it really affects the whole dining experience.
+    "cold_food": """I'm really sorry your food arrived cold. I know how disappointing it is when your meal doesn't arrive at the right temperature - it really affects the whole dining experience.
 
 📋 **What I'm doing right now:**
 • **Recording this temperature issue** for delivery quality review
@@ -368,10 +545,9 @@ This type of feedback helps us work with both restaurants and delivery partners
 
 📝 **Incident Status:** Logged for quality assurance follow-up
 
-Would you like me to include any additional details about the delivery timing or food condition?"""
+Would you like me to include any additional details about the delivery timing or food condition?""",
 
-    elif issue_type == "late_delivery":
-        return f"""I apologize for the delayed delivery of your order. I understand how inconvenient it is when your food takes longer than expected, especially when you're hungry and planning your time around the delivery.
+    "late_delivery": """I apologize for the delayed delivery of your order. I understand how inconvenient it is when your food takes longer than expected, especially when you're hungry and planning your time around the delivery.
 
 📋 **What I'm doing right now:**
 • **Recording this delivery delay** for route optimization review
@@ -383,10 +559,9 @@ Your feedback about delivery timing helps us improve our logistics and better ma
 
 📝 **Incident Status:** Documented for operational review and improvement
 
-Is there anything else about the delivery experience you'd like me to record?"""
+Is there anything else about the delivery experience you'd like me to record?""",
 
-    elif issue_type == "missing_items":
-        return f"""I'm sorry some items were missing from your order. I understand how frustrating it is when you're expecting certain items and they're not included in your delivery.
+    "missing_items": """I'm sorry some items were missing from your order. I understand how frustrating it is when you're expecting certain items and they're not included in your delivery.
 
 📋 **What I'm doing right now:**
 • **Logging this missing items incident** for quality control
@@ -398,10 +573,9 @@ This feedback is crucial for helping us improve our order verification processes
 
 📝 **Incident Status:** Recorded for merchant and operations team review
 
-Would you like me to document any other details about what was missing?"""
+Would you like me to document any other details about what was missing?""",
 
-    else:
-        return f"""I'm sorry to hear about the issue with your order. I understand your frustration and want to make sure we properly document what happened to help improve our service.
+    "general": """I'm sorry to hear about the issue with your order. I understand your frustration and want to make sure we properly document what happened to help improve our service.
 
 📋 **What I'm doing right now:**
 • **Logging your feedback** in our quality improvement system
@@ -413,17 +587,49 @@ Your feedback is valuable for helping us identify areas where we can do better.
 
 📝 **Incident Status:** Documented and forwarded for appropriate follow-up
 
-Is there anything specific about your experience you'd like me to include in the report?"""
+Is there anything specific about your experience you'd like me to include in the report?""",
+}
 
+def provide_generic_solution(issue_details: str) -> str:
+    """Conservative business response that expresses sympathy and logs incident without offering compensation"""
+    _trace("--- Conservative Business Response Strategy: %s ---", issue_details)
+    
+    # Determine issue type
+    _, found = _analyze(issue_details)
+    issue_type = _classify_issue(found, "generic", "general")
+    
+    # Conservative, sympathetic responses that log incidents without offering compensation
+    return GENERIC_SOLUTION_RESPONSES[issue_type]
+
+
+# Slang phrases and their plain-English meaning, for handle_edge_cases
+SLANG_MAP = {
+    "food is trash": "poor quality food",
+    "driver is sus": "suspicious driver behavior", 
+    "this is cap": "this seems wrong",
+    "no cap": "honestly",
+    "bet": "okay/sure",
+    "fire food": "excellent food",
+    "mid": "mediocre/average",
+    "lowkey": "somewhat/kind of",
+    "highkey": "very/really",
+    "slaps": "really good",
+    "bussin": "really good/delicious",
+    "periodt": "end of discussion"
+}
+# Longest phrase first so a shorter one can't shadow it
+_SLANG_RE = re.compile("|".join(re.escape(slang) for slang in sorted(SLANG_MAP, key=len, reverse=True)))
 
 def handle_edge_cases(message: str) -> dict:
     """Handle humor, vague complaints, slang, and incomplete information naturally"""
-    
-    message_lower = message.lower()
+    return _edge_cases(_parse(message))
+
+def _edge_cases(parsed: _Parsed) -> dict:
+    found = scan_keywords(parsed.lower)
+    word_count = len(parsed.tokens)
     
     # Humor detection
-    humor_indicators = ["lol", "haha", "😂", "😅", "funny", "joke", "kidding"]
-    if any(indicator in message_lower for indicator in humor_indicators):
+    if "humor" in found:
         return {
             "type": "humor",
             "response_style": "playful",
@@ -431,154 +637,196 @@ def handle_edge_cases(message: str) -> dict:
         }
     
     # Slang detection
-    slang_map = {
-        "food is trash": "poor quality food",
-        "driver is sus": "suspicious driver behavior", 
-        "this is cap": "this seems wrong",
-        "no cap": "honestly",
-        "bet": "okay/sure",
-        "fire food": "excellent food",
-        "mid": "mediocre/average",
-        "lowkey": "somewhat/kind of",
-        "highkey": "very/really",
-        "slaps": "really good",
-        "bussin": "really good/delicious",
-        "periodt": "end of discussion"
-    }
+    matched = set()
+    
+    def translate(match):
+        matched.add(match.group(0))
+        return SLANG_MAP[match.group(0)]
     
-    translated_message = message_lower
-    slang_found = []
-    for slang, meaning in slang_map.items():
-        if slang in message_lower:
-            translated_message = translated_message.replace(slang, meaning)
-            slang_found.append(slang)
+    translated_message = _SLANG_RE.sub(translate, parsed.lower)
+    slang_found = [slang for slang in SLANG_MAP if slang in matched]
     
     # Vague complaint detection
-    vague_indicators = ["bad", "terrible", "awful", "horrible", "not good", "disappointing"]
-    is_vague = any(indicator in message_lower for indicator in vague_indicators) and len(message.split()) < 8
+    is_vague = "vague" in found and word_count < 8
     
     # Incomplete information detection
-    question_words = ["what", "when", "where", "how", "why"]
-    has_questions = any(word in message_lower for word in question_words)
-    is_incomplete = len(message.split()) < 5 or has_questions
+    has_questions = "question" in found
+    is_incomplete = word_count < 5 or has_questions
     
     return {
-        "original_message": message,
+        "original_message": parsed.raw,
         "translated_message": translated_message,
         "slang_detected": slang_found,
         "is_vague": is_vague,
         "is_incomplete": is_incomplete,
-        "has_humor": len([h for h in humor_indicators if h in message_lower]) > 0,
+        "has_humor": "humor" in found,
         "response_style": "casual" if slang_found else "professional"
     }
 
+# Casual/slang responses
+_CASUAL_INTROS = {
+    "spilled": "Yooo, that's actually terrible! Food everywhere is NOT the vibe 😭",
+    "wrong_order": "Bruh, getting the wrong order hits different when you're hungry! That's on us fr",
+    "late_delivery": "Okay that wait time is lowkey unacceptable, my bad on that one!",
+    "cold_food": "Cold food is just... nah. That's not it, chief. Let me fix this for real",
+    "poor_quality": "If the food was mid/trash, that's totally our fault - we gotta make this right!"
+}
+
+# Humor/playful tone
+_PLAYFUL_RESPONSES = {
+    "spilled": "Haha, okay but seriously - spilled food is like a tragedy with a side of mess! Let me fix this disaster 😄",
+    "wrong_order": "LOL I wish mix-ups were actually funny, but when you're hungry it's just cruel! Let me sort this out",
+    "late_delivery": "Right? The waiting game is NOT fun when food is involved! Time to make this worth the wait",
+}
+
+# Vague complaint handling
+_EMPATHETIC_RESPONSES = (
+    "I can tell you're frustrated, and that's completely valid! Even though I don't have all the details, I want to help you right away.",
+    "Something clearly went wrong with your experience, and I'm sorry about that! Let me see what I can do to make you feel better.",
+    "I hear the disappointment in your message, and I want to turn this around for you immediately!"
+)
+
 def generate_natural_response(issue_type: str, edge_case_info: dict) -> str:
     """Generate natural responses based on communication style and edge cases"""
     
     # Casual/slang responses
     if edge_case_info["response_style"] == "casual":
-        casual_intros = {
-            "spilled": "Yooo, that's actually terrible! Food everywhere is NOT the vibe 😭",
-            "wrong_order": "Bruh, getting the wrong order hits different when you're hungry! That's on us fr",
-            "late_delivery": "Okay that wait time is lowkey unacceptable, my bad on that one!",
-            "cold_food": "Cold food is just... nah. That's not it, chief. Let me fix this for real",
-            "poor_quality": "If the food was mid/trash, that's totally our fault - we gotta make this right!"
-        }
-        return casual_intros.get(issue_type, "My bad, let me make this right for you!")
+        return _CASUAL_INTROS.get(issue_type, "My bad, let me make this right for you!")
     
     # Vague complaint handling
     elif edge_case_info["is_vague"]:
-        empathetic_responses = [
-            "I can tell you're frustrated, and that's completely valid! Even though I don't have all the details, I want to help you right away.",
-            "Something clearly went wrong with your experience, and I'm sorry about that! Let me see what I can do to make you feel better.",
-            "I hear the disappointment in your message, and I want to turn this around for you immediately!"
-        ]
-        return random.choice(empathetic_responses)
+        return _RNG.choice(_EMPATHETIC_RESPONSES)
     
     # Humor/playful tone
     elif edge_case_info["has_humor"]:
-        playful_responses = {
-            "spilled": "Haha, okay but seriously - spilled food is like a tragedy with a side of mess! Let me fix this disaster 😄",
-            "wrong_order": "LOL I wish mix-ups were actually funny, but when you're hungry it's just cruel! Let me sort this out",
-            "late_delivery": "Right? The waiting game is NOT fun when food is involved! Time to make this worth the wait",
-        }
-        return playful_responses.get(issue_type, "I appreciate you keeping it light! Let me make sure this ends on a high note 😊")
+        return _PLAYFUL_RESPONSES.get(issue_type, "I appreciate you keeping it light! Let me make sure this ends on a high note 😊")
     
     # Professional but warm default
     else:
         return "I understand your concern and I'm here to help resolve this for you right away."
 
+# Simulated customer profiles for non-sandbox mode
+_PROFILES = (
+    "Premium customer (50+ orders, 4.8/5 rating, 1 complaint in 6 months) - High trust level",
+    "Regular customer (15 orders, 4.2/5 rating, 2 complaints resolved) - Normal trust level", 
+    "New customer (3 orders, no ratings, first complaint) - Standard verification needed",
+    "Frequent complainer (20 orders, 3.1/5 rating, 8 complaints) - Enhanced verification required"
+)
+
+# Sandbox lookups are read-mostly and the same ids come up repeatedly within a
+# conversation, so the lookups behind these tools are memoized. The tools that
+# write to the sandbox (refunds, driver and merchant records) call
+# clear_lookup_caches() afterwards; call it after any other change to sandbox
+# data (or between tests).
+@functools.lru_cache(maxsize=1024)
+def _customer_history(customer_id: str) -> str:
+    sandbox = _load_sandbox()
+    if sandbox:
+        return sandbox.get_customer_profile(customer_id)
+    
+    # Fallback for non-sandbox mode
+    return f"Customer Profile: {_RNG.choice(_PROFILES)}"
+
 def check_customer_history(customer_id: str) -> str:
     """Check customer's order history and complaint patterns with sandbox data."""
-    print(f"--- Checking Customer History: {customer_id} ---")
+    _trace("--- Checking Customer History: %s ---", customer_id)
+    return _customer_history(customer_id)
+
+REFUND_FORMAT_ERROR = "Error: Please provide refund details as customer_id,amount,reason"
+VOUCHER_FORMAT_ERROR = "Error: Please provide voucher details as customer_id,amount,voucher_type"
+INCIDENT_FORMAT_ERROR = "Error: Please provide incident details as incident_type,details,involved_parties"
+
+def _parse_fields(details: str, count: int):
+    """Split comma-separated tool input into exactly count fields (the last keeps any extra commas); None if too few"""
+    parts = details.split(",", count - 1) if details else []
+    return tuple(parts) if len(parts) == count else None
+
+def _parse_amount(text: str):
+    """Parse a money amount such as '300', ' 300.5' or '₹300'; None unless it is a finite positive number"""
+    try:
+        amount = float(text.strip().lstrip("₹$"))
+    except ValueError:
+        return None
+    return amount if math.isfinite(amount) and amount > 0 else None
+
+def _parse_refund(details: str):
+    """Split 'customer_id,amount,reason' into (customer_id, amount, reason); None if malformed"""
+    parts = _parse_fields(details, 3)
+    if parts is None:
+        return None
+    amount = _parse_amount(parts[1])
+    if amount is None:
+        return None
+    return parts[0].strip(), amount, parts[2].strip()
+
+def issue_instant_refund(refund_details: str) -> str:
+    """Issue instant refund with proper documentation using sandbox.
+    Only after gather_compensation_details and negotiate_fair_compensation, or when the customer explicitly demands money back."""
+    parsed = _parse_refund(refund_details)
+    if parsed is None:
+        return REFUND_FORMAT_ERROR
+    customer_id, amount, reason = parsed
     
-    if SANDBOX_AVAILABLE:
-        return get_customer_profile(customer_id)
+    _trace("--- Processing Refund: $%s to %s for %s ---", amount, customer_id, reason)
     
-    # Fallback for non-sandbox mode
-    profiles = [
-        "Premium customer (50+ orders, 4.8/5 rating, 1 complaint in 6 months) - High trust level",
-        "Regular customer (15 orders, 4.2/5 rating, 2 complaints resolved) - Normal trust level", 
-        "New customer (3 orders, no ratings, first complaint) - Standard verification needed",
-        "Frequent complainer (20 orders, 3.1/5 rating, 8 complaints) - Enhanced verification required"
-    ]
+    sandbox = _load_sandbox()
+    if sandbox:
+        result = sandbox.process_customer_refund(customer_id, amount, reason)
+        clear_lookup_caches()  # wallet and eligibility have changed
+        return result
     
-    return f"Customer Profile: {random.choice(profiles)}"
-
-def issue_instant_refund(refund_details: str) -> str:
-    """Issue instant refund with proper documentation using sandbox."""
-    try:
-        customer_id, amount, reason = refund_details.split(',', 2)
-        amount = float(amount.strip())
-        reason = reason.strip()
-        
-        print(f"--- Processing Refund: ${amount} to {customer_id} for {reason} ---")
-        
-        if SANDBOX_AVAILABLE:
-            return process_customer_refund(customer_id, amount, reason)
-        
-        # Fallback
-        return f"Instant refund of ₹{amount} processed for customer {customer_id}. Reason: {reason}. Funds will appear in 1-3 business days."
-    except:
-        return "Error: Please provide refund details as customer_id,amount,reason"
+    # Fallback
+    return f"Instant refund of ₹{amount} processed for customer {customer_id}. Reason: {reason}. Funds will appear in 1-3 business days."
 
 def exonerate_driver(driver_details: str) -> str:
     """Clear driver of fault with documentation using sandbox."""
-    driver_id, reason = driver_details.split(',', 1) if ',' in driver_details else (driver_details, "Evidence supports innocence")
-    print(f"--- Exonerating Driver {driver_id}: {reason} ---")
+    driver_id, sep, reason = driver_details.partition(',')
+    if not sep:
+        reason = "Evidence supports innocence"
+    _trace("--- Exonerating Driver %s: %s ---", driver_id, reason)
     
-    if SANDBOX_AVAILABLE:
-        return exonerate_delivery_partner(driver_id, reason)
+    sandbox = _load_sandbox()
+    if sandbox:
+        result = sandbox.exonerate_delivery_partner(driver_id, reason)
+        clear_lookup_caches()
+        return result
     
     # Fallback
     return f"Driver {driver_id} cleared of all fault. Reason: {reason}. No impact on performance record."
 
 def log_merchant_packaging_feedback(feedback_details: str) -> str:
     """Log detailed merchant feedback for quality improvement using sandbox."""
-    try:
-        merchant_id, feedback = feedback_details.split(',', 1)
-        print(f"--- Logging Merchant Feedback: {merchant_id} ---")
-        
-        if SANDBOX_AVAILABLE:
-            return log_merchant_quality_issue(merchant_id.strip(), feedback.strip(), "high")
-        
-        # Fallback
-        return f"Quality feedback logged for merchant {merchant_id.strip()}: '{feedback.strip()}'. Forwarded to merchant quality team for review and improvement action."
-    except:
+    merchant_id, sep, feedback = feedback_details.partition(',')
+    if not sep:
         return "Error: Please provide feedback as merchant_id,feedback_details"
+    _trace("--- Logging Merchant Feedback: %s ---", merchant_id)
+    
+    sandbox = _load_sandbox()
+    if sandbox:
+        result = sandbox.log_merchant_quality_issue(merchant_id.strip(), feedback.strip(), "high")
+        clear_lookup_caches()
+        return result
+    
+    # Fallback
+    return f"Quality feedback logged for merchant {merchant_id.strip()}: '{feedback.strip()}'. Forwarded to merchant quality team for review and improvement action."
 
 # New sandbox-specific tools for advanced reasoning
 
 def analyze_order_discrepancy(order_id: str) -> str:
-    """Analyze what went wrong with a specific order"""
+    """Analyze what went wrong with a specific order. Falls back to 'ORD_001' for placeholder ids."""
     # Handle placeholder inputs
-    if not order_id or "obtained from" in order_id.lower() or order_id.lower() in ["null", "none"]:
+    order_lower = (order_id or "").lower()
+    if not order_lower or "obtained from" in order_lower or order_lower in PLACEHOLDER_INPUTS:
         order_id = "ORD_001"  # Default to first sandbox order
     
-    print(f"--- Analyzing Order Discrepancy: {order_id} ---")
-    
-    if SANDBOX_AVAILABLE:
-        return get_order_investigation(order_id)
+    _trace("--- Analyzing Order Discrepancy: %s ---", order_id)
+    return _order_discrepancy(order_id)
+
+@functools.lru_cache(maxsize=1024)
+def _order_discrepancy(order_id: str) -> str:
+    sandbox = _load_sandbox()
+    if sandbox:
+        return sandbox.get_order_investigation(order_id)
     
     return f"""Order Analysis for {order_id}:
     • Order Status: Completed with customer complaint
@@ -588,31 +836,36 @@ def analyze_order_discrepancy(order_id: str) -> str:
     • Root Cause: Kitchen preparation error
     • Recommendation: Full refund + merchant feedback"""
 
+DEFAULT_ELIGIBILITY_REQUEST = ("C001", "ORD_001", 450.0)
+
+def _parse_eligibility(details: str):
+    """Split 'customer_id,order_id,amount'; DEFAULT_ELIGIBILITY_REQUEST if it isn't in that form"""
+    if not details or ',' not in details:
+        return DEFAULT_ELIGIBILITY_REQUEST
+    parts = details.split(',')
+    requested_amount = 450.0
+    if len(parts) > 2:
+        requested_amount = _parse_amount(parts[2])
+        if requested_amount is None:
+            return DEFAULT_ELIGIBILITY_REQUEST
+    return parts[0].strip(), parts[1].strip(), requested_amount
+
 def assess_refund_eligibility(eligibility_details: str) -> str:
-    """Assess customer eligibility for refund based on history and order details"""
+    """Assess customer eligibility for refund based on history and order details.
+    Input is 'customer_id,order_id,amount'; anything else (e.g. 'refund_assessment') uses the defaults."""
     # Parse input or use defaults
-    try:
-        if ',' in eligibility_details:
-            parts = eligibility_details.split(',')
-            customer_id = parts[0].strip() if len(parts) > 0 else "C001"
-            order_id = parts[1].strip() if len(parts) > 1 else "ORD_001"
-            requested_amount = float(parts[2].strip()) if len(parts) > 2 else 450.0
-        else:
-            customer_id = "C001"
-            order_id = "ORD_001"
-            requested_amount = 450.0
-    except:
-        customer_id = "C001"
-        order_id = "ORD_001"
-        requested_amount = 450.0
-    
-    print(f"--- Assessing Refund Eligibility for {customer_id} ---")
-    
-    if SANDBOX_AVAILABLE:
+    customer_id, order_id, requested_amount = _parse_eligibility(eligibility_details)
+    
+    _trace("--- Assessing Refund Eligibility for %s ---", customer_id)
+    return _refund_eligibility(customer_id, order_id, requested_amount)
+
+@functools.lru_cache(maxsize=1024)
+def _refund_eligibility(customer_id: str, order_id: str, requested_amount: float) -> str:
+    sandbox = _load_sandbox()
+    if sandbox:
         try:
-            from sandbox_tools import check_refund_eligibility
-            return check_refund_eligibility(customer_id, order_id, requested_amount)
-        except:
+            return sandbox.check_refund_eligibility(customer_id, order_id, requested_amount)
+        except Exception:
             pass
     
     return f"""Refund Eligibility Assessment:
@@ -627,30 +880,42 @@ def assess_refund_eligibility(eligibility_details: str) -> str:
 
 def check_merchant_substitution_policy(merchant_id: str, original_item: str) -> str:
     """Check merchant's item substitution policy"""
-    print(f"--- Checking Substitution Policy: {merchant_id} ---")
-    
-    if SANDBOX_AVAILABLE:
+    _trace("--- Checking Substitution Policy: %s ---", merchant_id)
+    return _substitution_policy(merchant_id, original_item)
+
+@functools.lru_cache(maxsize=1024)
+def _substitution_policy(merchant_id: str, original_item: str) -> str:
+    sandbox = _load_sandbox()
+    if sandbox:
         try:
-            from sandbox_tools import get_merchant_substitute_policy
-            return get_merchant_substitute_policy(merchant_id, original_item)
-        except:
+            return sandbox.get_merchant_substitute_policy(merchant_id, original_item)
+        except Exception:
             pass
     
     return f"Substitution policy for {merchant_id}: Standard merchant substitution guidelines apply."
 
+def clear_lookup_caches():
+    """Forget memoized sandbox lookups, e.g. after refunds or complaints change the data"""
+    for lookup in (
+        _customer_history, _order_discrepancy, _refund_eligibility, _substitution_policy,
+        _merchant_record, _merchants_serving,
+    ):
+        lookup.cache_clear()
+
 def validate_customer_complaint(complaint_details: str) -> str:
-    """Validate customer complaint against order history and delivery logs"""
+    """Validate customer complaint against order history and delivery logs, e.g. 'received wrong order'"""
     # Default customer ID if not provided
     customer_id = "C001"
     
     # Handle missing complaint details
-    if not complaint_details or complaint_details.lower() in ["null", "none"]:
+    if not complaint_details or complaint_details.lower() in PLACEHOLDER_INPUTS:
         complaint_details = "Customer reported wrong order received"
     
-    print(f"--- Validating Complaint from {customer_id} ---")
+    _trace("--- Validating Complaint from %s ---", customer_id)
     
-    if SANDBOX_AVAILABLE:
-        customer_profile = get_customer_profile(customer_id)
+    sandbox = _load_sandbox()
+    if sandbox:
+        customer_profile = sandbox.get_customer_profile(customer_id)
         return f"COMPLAINT VALIDATION:\n{customer_profile}\n\nComplaint Details: {complaint_details}\nValidation Status: Cross-referenced with order history and delivery logs."
     
     return f"""Complaint Validation for {customer_id}:
@@ -661,106 +926,102 @@ def validate_customer_complaint(complaint_details: str) -> str:
     • Validation: LEGITIMATE - Customer has strong track record
     • Recommendation: Process refund immediately"""
 
+# Simulated driver records, one picked per check_driver_history call
+_DRIVER_PROFILES = (
+    "Experienced driver (4.9/5 rating, 2000+ deliveries, 0 incidents this month) - Highly reliable",
+    "Good driver (4.6/5 rating, 500 deliveries, 1 minor incident) - Generally reliable",
+    "New driver (4.3/5 rating, 50 deliveries, learning phase) - Normal monitoring",
+    "Problematic driver (4.0/5 rating, 200 deliveries, 3 incidents this month) - Under review"
+)
+
 def check_driver_history(driver_id: str) -> str:
     """Check driver's performance and incident history."""
-    print(f"--- Checking Driver History: {driver_id} ---")
+    _trace("--- Checking Driver History: %s ---", driver_id)
     
-    profiles = [
-        "Experienced driver (4.9/5 rating, 2000+ deliveries, 0 incidents this month) - Highly reliable",
-        "Good driver (4.6/5 rating, 500 deliveries, 1 minor incident) - Generally reliable",
-        "New driver (4.3/5 rating, 50 deliveries, learning phase) - Normal monitoring",
-        "Problematic driver (4.0/5 rating, 200 deliveries, 3 incidents this month) - Under review"
-    ]
-    
-    return f"Driver Profile: {random.choice(profiles)}"
+    return f"Driver Profile: {_RNG.choice(_DRIVER_PROFILES)}"
+
+# Simulated merchant records, one picked per check_merchant_history call
+_MERCHANT_PROFILES = (
+    "Top-rated merchant (4.8/5 stars, 98% order accuracy, minimal complaints) - Excellent track record",
+    "Good merchant (4.4/5 stars, 94% order accuracy, occasional packaging issues) - Generally reliable",
+    "Average merchant (4.1/5 stars, 88% order accuracy, moderate complaint rate) - Needs improvement",
+    "Problematic merchant (3.8/5 stars, 82% order accuracy, frequent quality issues) - Under performance review"
+)
 
 def check_merchant_history(merchant_id: str) -> str:
     """Check merchant's quality ratings and issue history."""
-    print(f"--- Checking Merchant History: {merchant_id} ---")
-    
-    profiles = [
-        "Top-rated merchant (4.8/5 stars, 98% order accuracy, minimal complaints) - Excellent track record",
-        "Good merchant (4.4/5 stars, 94% order accuracy, occasional packaging issues) - Generally reliable",
-        "Average merchant (4.1/5 stars, 88% order accuracy, moderate complaint rate) - Needs improvement",
-        "Problematic merchant (3.8/5 stars, 82% order accuracy, frequent quality issues) - Under performance review"
-    ]
-    
-    return f"Merchant Profile: {random.choice(profiles)}"
+    _trace("--- Checking Merchant History: %s ---", merchant_id)
+    
+    return f"Merchant Profile: {_RNG.choice(_MERCHANT_PROFILES)}"
+
+# Realistic tracking scenarios for track_delivery_status
+_TRACKING_SCENARIOS = (
+    {
+        "status": "order_confirmed",
+        "location": "Food Corner Restaurant",
+        "estimated_time": "25 minutes",
+        "details": "Order confirmed by restaurant. Currently being prepared.",
+        "next_update": "Driver assignment in 10-15 minutes"
+    },
+    {
+        "status": "preparing", 
+        "location": "Food Corner Kitchen",
+        "estimated_time": "20 minutes",
+        "details": "Your food is being freshly prepared by the restaurant.",
+        "next_update": "Driver will be assigned once preparation is complete"
+    },
+    {
+        "status": "ready_for_pickup",
+        "location": "Food Corner Restaurant", 
+        "estimated_time": "15 minutes",
+        "details": "Food is ready! Waiting for driver assignment.",
+        "next_update": "Driver pickup in 5-10 minutes"
+    },
+    {
+        "status": "driver_assigned",
+        "location": "En route to restaurant",
+        "estimated_time": "18 minutes", 
+        "details": "Mike Wilson (Driver) has been assigned and is heading to pickup your order.",
+        "next_update": "Pickup confirmation expected in 8-12 minutes"
+    },
+    {
+        "status": "picked_up",
+        "location": "0.8 km from your location",
+        "estimated_time": "12 minutes",
+        "details": "Driver Mike Wilson has picked up your order and is on the way to you!",
+        "next_update": "Live tracking available, delivery in progress"
+    },
+    {
+        "status": "nearby",
+        "location": "200 meters from delivery address", 
+        "estimated_time": "3 minutes",
+        "details": "Your driver is very close! Please be ready to receive your order.",
+        "next_update": "Delivery completion imminent"
+    },
+    {
+        "status": "delayed_traffic",
+        "location": "Stuck in traffic, 1.2 km away",
+        "estimated_time": "25 minutes (updated)",
+        "details": "Heavy traffic is causing delays. Driver is in slow-moving traffic but making progress.",
+        "next_update": "Continuous updates as traffic clears"
+    },
+    {
+        "status": "delayed_weather",
+        "location": "Taking shelter, 0.5 km away", 
+        "estimated_time": "20 minutes (weather delay)",
+        "details": "Driver has temporarily stopped due to heavy rain for safety. Will resume delivery once safe.",
+        "next_update": "Movement will resume when weather improves"
+    }
+)
 
-def track_delivery_status(order_id: str) -> str:
-    """Get real-time delivery tracking with detailed status information"""
-    print(f"--- Tracking Order: {order_id} ---")
-    
-    # Generate realistic tracking scenarios
-    tracking_scenarios = [
-        {
-            "status": "order_confirmed",
-            "location": "Food Corner Restaurant",
-            "estimated_time": "25 minutes",
-            "details": "Order confirmed by restaurant. Currently being prepared.",
-            "next_update": "Driver assignment in 10-15 minutes"
-        },
-        {
-            "status": "preparing", 
-            "location": "Food Corner Kitchen",
-            "estimated_time": "20 minutes",
-            "details": "Your food is being freshly prepared by the restaurant.",
-            "next_update": "Driver will be assigned once preparation is complete"
-        },
-        {
-            "status": "ready_for_pickup",
-            "location": "Food Corner Restaurant", 
-            "estimated_time": "15 minutes",
-            "details": "Food is ready! Waiting for driver assignment.",
-            "next_update": "Driver pickup in 5-10 minutes"
-        },
-        {
-            "status": "driver_assigned",
-            "location": "En route to restaurant",
-            "estimated_time": "18 minutes", 
-            "details": "Mike Wilson (Driver) has been assigned and is heading to pickup your order.",
-            "next_update": "Pickup confirmation expected in 8-12 minutes"
-        },
-        {
-            "status": "picked_up",
-            "location": "0.8 km from your location",
-            "estimated_time": "12 minutes",
-            "details": "Driver Mike Wilson has picked up your order and is on the way to you!",
-            "next_update": "Live tracking available, delivery in progress"
-        },
-        {
-            "status": "nearby",
-            "location": "200 meters from delivery address", 
-            "estimated_time": "3 minutes",
-            "details": "Your driver is very close! Please be ready to receive your order.",
-            "next_update": "Delivery completion imminent"
-        },
-        {
-            "status": "delayed_traffic",
-            "location": "Stuck in traffic, 1.2 km away",
-            "estimated_time": "25 minutes (updated)",
-            "details": "Heavy traffic is causing delays. Driver is in slow-moving traffic but making progress.",
-            "next_update": "Continuous updates as traffic clears"
-        },
-        {
-            "status": "delayed_weather",
-            "location": "Taking shelter, 0.5 km away", 
-            "estimated_time": "20 minutes (weather delay)",
-            "details": "Driver has temporarily stopped due to heavy rain for safety. Will resume delivery once safe.",
-            "next_update": "Movement will resume when weather improves"
-        }
-    ]
-    
-    scenario = random.choice(tracking_scenarios)
-    
-    return f"""📍 **LIVE ORDER TRACKING - {order_id}**
+TRACKING_REPORT_TEMPLATE = """📍 **LIVE ORDER TRACKING - {order_id}**
 
-🚗 **Current Status:** {scenario['status'].replace('_', ' ').title()}
-📍 **Location:** {scenario['location']}
-⏰ **Estimated Delivery:** {scenario['estimated_time']}
+🚗 **Current Status:** {status_display}
+📍 **Location:** {location}
+⏰ **Estimated Delivery:** {estimated_time}
 
-📋 **Details:** {scenario['details']}
-🔄 **Next Update:** {scenario['next_update']}
+📋 **Details:** {details}
+🔄 **Next Update:** {next_update}
 
 👤 **Your Driver:** Mike Wilson (★4.6 rating)
 📞 **Contact:** Available through app
@@ -770,9 +1031,26 @@ def track_delivery_status(order_id: str) -> str:
 • Contact driver if needed  
 • Prepare to receive delivery"""
 
+# One report per scenario, rendered at import; only {order_id} is left to fill
+_TRACKING_REPORTS = tuple(
+    TRACKING_REPORT_TEMPLATE.format_map({
+        **scenario,
+        "status_display": scenario["status"].replace("_", " ").title(),
+        "order_id": "{order_id}",
+    })
+    for scenario in _TRACKING_SCENARIOS
+)
+
+def track_delivery_status(order_id: str) -> str:
+    """Get real-time delivery tracking with detailed status information.
+    First call for 'where is my order', 'driver is late' or 'order status'; use 'ORD_001' when the order is unknown."""
+    _trace("--- Tracking Order: %s ---", order_id)
+    
+    return _RNG.choice(_TRACKING_REPORTS).format_map({"order_id": order_id})
+
 def analyze_gps_data(order_id: str) -> str:
     """Analyze GPS coordinates and route efficiency."""
-    print(f"--- Analyzing GPS Data: {order_id} ---")
+    _trace("--- Analyzing GPS Data: %s ---", order_id)
     
     return """GPS Analysis:
     • Route Efficiency: 94% optimal (standard city traffic)
@@ -781,219 +1059,237 @@ def analyze_gps_data(order_id: str) -> str:
     • Anomalies: None detected
     • Verification: GPS coordinates match reported delivery address"""
 
-def check_weather_conditions(location_time: str) -> str:
-    """Check weather conditions with enhanced context for delivery delays"""
-    print(f"--- Checking Weather Context: {location_time} ---")
-    
-    # Simulate realistic weather conditions
-    weather_scenarios = [
-        {
-            "condition": "Heavy Rainfall",
-            "impact": "Severe delivery delays expected",
-            "description": "Intense rainfall with 25mm/hour precipitation. Roads are waterlogged in several areas.",
-            "delivery_impact": "30-45 minute delays typical",
-            "safety_note": "Drivers taking extra caution for safety"
-        },
-        {
-            "condition": "Thunderstorm Warning", 
-            "impact": "Major service disruptions",
-            "description": "Active thunderstorm with lightning. Many delivery partners temporarily sheltering.",
-            "delivery_impact": "45-60 minute delays possible",
-            "safety_note": "Safety protocols require drivers to seek shelter during lightning"
-        },
-        {
-            "condition": "Light Rain",
-            "impact": "Minor delivery delays",
-            "description": "Light intermittent showers affecting traffic flow.",
-            "delivery_impact": "10-15 minute delays",
-            "safety_note": "Slower speeds for safety"
-        },
-        {
-            "condition": "Clear Weather",
-            "impact": "Normal delivery operations",
-            "description": "Clear skies with good visibility.",
-            "delivery_impact": "No weather-related delays",
-            "safety_note": "Optimal delivery conditions"
-        },
-        {
-            "condition": "Heavy Traffic + Rain",
-            "impact": "Combined delays",
-            "description": "Rain causing significant traffic congestion throughout the city.",
-            "delivery_impact": "20-35 minute delays",
-            "safety_note": "Delivery partners navigating carefully through congested areas"
-        }
-    ]
-    
-    # Select weather based on time of day and randomness
-    current_hour = datetime.now().hour
-    if 17 <= current_hour <= 20:  # Peak hours
-        weather = random.choice(weather_scenarios[:3])  # More likely to have issues
-    else:
-        weather = random.choice(weather_scenarios)
-    
-    return f"""🌦️ WEATHER ANALYSIS - {location_time.upper()}:
+# Realistic weather conditions for check_weather_conditions
+_WEATHER_SCENARIOS = (
+    {
+        "condition": "Heavy Rainfall",
+        "impact": "Severe delivery delays expected",
+        "description": "Intense rainfall with 25mm/hour precipitation. Roads are waterlogged in several areas.",
+        "delivery_impact": "30-45 minute delays typical",
+        "safety_note": "Drivers taking extra caution for safety"
+    },
+    {
+        "condition": "Thunderstorm Warning", 
+        "impact": "Major service disruptions",
+        "description": "Active thunderstorm with lightning. Many delivery partners temporarily sheltering.",
+        "delivery_impact": "45-60 minute delays possible",
+        "safety_note": "Safety protocols require drivers to seek shelter during lightning"
+    },
+    {
+        "condition": "Light Rain",
+        "impact": "Minor delivery delays",
+        "description": "Light intermittent showers affecting traffic flow.",
+        "delivery_impact": "10-15 minute delays",
+        "safety_note": "Slower speeds for safety"
+    },
+    {
+        "condition": "Clear Weather",
+        "impact": "Normal delivery operations",
+        "description": "Clear skies with good visibility.",
+        "delivery_impact": "No weather-related delays",
+        "safety_note": "Optimal delivery conditions"
+    },
+    {
+        "condition": "Heavy Traffic + Rain",
+        "impact": "Combined delays",
+        "description": "Rain causing significant traffic congestion throughout the city.",
+        "delivery_impact": "20-35 minute delays",
+        "safety_note": "Delivery partners navigating carefully through congested areas"
+    }
+)
 
-**Current Conditions:** {weather['condition']}
-**Impact Level:** {weather['impact']}
+WEATHER_REPORT_TEMPLATE = """🌦️ WEATHER ANALYSIS - {location}:
+
+**Current Conditions:** {condition}
+**Impact Level:** {impact}
 
 📊 **Detailed Report:**
-• Weather: {weather['description']}
-• Delivery Impact: {weather['delivery_impact']}
-• Safety Consideration: {weather['safety_note']}
+• Weather: {description}
+• Delivery Impact: {delivery_impact}
+• Safety Consideration: {safety_note}
 
 🚗 **Recommendation for Customer Service:**
-{weather['condition']} is affecting delivery operations in your area. This provides context for any delays and shows our delivery partners are prioritizing safety while protecting food quality.
+{condition} is affecting delivery operations in your area. This provides context for any delays and shows our delivery partners are prioritizing safety while protecting food quality.
 
 **Use this information to:**
 • Explain delays with empathy and context
 • Show customer that delays are weather-related, not service failures
 • Demonstrate mature understanding of uncontrollable factors"""
 
+# One report per condition, rendered at import; only {location} is left to fill
+_WEATHER_REPORTS = tuple(
+    WEATHER_REPORT_TEMPLATE.format_map({**weather, "location": "{location}"})
+    for weather in _WEATHER_SCENARIOS
+)
+
+# The first three are the disruptive ones, favoured at peak hours
+_WEATHER_PEAK_REPORTS = _WEATHER_REPORTS[:3]
+
+# (monotonic time, hour) of the last clock read; the peak-hour check only needs
+# the hour, so it is re-read at most once a minute
+_hour_cache = (float("-inf"), -1)
+
+def _current_hour() -> int:
+    global _hour_cache
+    checked_at, hour = _hour_cache
+    now = time.monotonic()
+    if now - checked_at >= 60:
+        hour = datetime.now().hour
+        _hour_cache = (now, hour)
+    return hour
+
+def check_weather_conditions(location_time: str) -> str:
+    """Check weather conditions with enhanced context for delivery delays"""
+    _trace("--- Checking Weather Context: %s ---", location_time)
+    
+    # Select weather based on time of day and randomness
+    current_hour = _current_hour()
+    if 17 <= current_hour <= 20:  # Peak hours
+        weather_report = _RNG.choice(_WEATHER_PEAK_REPORTS)  # More likely to have issues
+    else:
+        weather_report = _RNG.choice(_WEATHER_REPORTS)
+    
+    return weather_report.format_map({"location": location_time.upper()})
+
+# Simulated driver replies for contact_driver
+_DRIVER_RESPONSES = (
+    "Driver responded: 'Customer not at delivery address, trying alternative contact'",
+    "Driver confirmed: 'Order delivered to specified location, customer received items'",
+    "Driver explained: 'Traffic jam caused delay, sent customer notification'",
+    "Driver reported: 'Merchant had to remake order due to quality issue'"
+)
+
 def contact_driver(driver_message: str) -> str:
     """Send message or call driver for clarification."""
-    driver_id, message = driver_message.split(',', 1) if ',' in driver_message else (driver_message, "Status update")
-    print(f"--- Contacting Driver {driver_id}: {message} ---")
-    
-    responses = [
-        "Driver responded: 'Customer not at delivery address, trying alternative contact'",
-        "Driver confirmed: 'Order delivered to specified location, customer received items'",
-        "Driver explained: 'Traffic jam caused delay, sent customer notification'",
-        "Driver reported: 'Merchant had to remake order due to quality issue'"
-    ]
+    driver_id, sep, message = driver_message.partition(',')
+    if not sep:
+        message = "Status update"
+    _trace("--- Contacting Driver %s: %s ---", driver_id, message)
     
-    return f"Driver Communication: {random.choice(responses)}"
+    return f"Driver Communication: {_RNG.choice(_DRIVER_RESPONSES)}"
+
+# Simulated merchant replies for contact_merchant
+_MERCHANT_RESPONSES = (
+    "Merchant confirmed: 'Order prepared correctly, packaged according to standards'",
+    "Merchant admitted: 'Kitchen error occurred, willing to remake order at no charge'",
+    "Merchant explained: 'Delay due to ingredient shortage, offered substitute items'",
+    "Merchant investigating: 'Reviewing kitchen procedures, will provide feedback within 2 hours'"
+)
 
 def contact_merchant(merchant_message: str) -> str:
     """Contact merchant about order issues."""
-    merchant_id, message = merchant_message.split(',', 1) if ',' in merchant_message else (merchant_message, "Order inquiry")
-    print(f"--- Contacting Merchant {merchant_id}: {message} ---")
-    
-    responses = [
-        "Merchant confirmed: 'Order prepared correctly, packaged according to standards'",
-        "Merchant admitted: 'Kitchen error occurred, willing to remake order at no charge'",
-        "Merchant explained: 'Delay due to ingredient shortage, offered substitute items'",
-        "Merchant investigating: 'Reviewing kitchen procedures, will provide feedback within 2 hours'"
-    ]
+    merchant_id, sep, message = merchant_message.partition(',')
+    if not sep:
+        message = "Order inquiry"
+    _trace("--- Contacting Merchant %s: %s ---", merchant_id, message)
     
-    return f"Merchant Response: {random.choice(responses)}"
+    return f"Merchant Response: {_RNG.choice(_MERCHANT_RESPONSES)}"
 
 def verify_customer_identity(verification_request: str) -> str:
     """Verify customer identity for security purposes."""
-    customer_id, method = verification_request.split(',', 1) if ',' in verification_request else (verification_request, "standard")
-    print(f"--- Verifying Customer Identity: {customer_id} via {method} ---")
+    customer_id, sep, method = verification_request.partition(',')
+    if not sep:
+        method = "standard"
+    _trace("--- Verifying Customer Identity: %s via %s ---", customer_id, method)
     
     return f"Identity Verification: Customer {customer_id} successfully verified via {method}. Security check passed."
 
 def offer_compensation_voucher(voucher_details: str) -> str:
-    """Offer voucher or credits as compensation."""
-    try:
-        customer_id, amount, voucher_type = voucher_details.split(',')
-        print(f"--- Offering Voucher: {voucher_type} worth {amount} to {customer_id} ---")
-        return f"Successfully issued {voucher_type} voucher worth ${amount} to customer {customer_id}. Valid for 30 days, applicable to future orders."
-    except:
-        return "Error: Please provide voucher details as customer_id,amount,voucher_type"
-
-def issue_instant_refund(refund_details: str) -> str:
-    """Issue instant refund with proper documentation."""
-    try:
-        customer_id, amount, reason = refund_details.split(',', 2)
-        print(f"--- Processing Refund: ${amount} to {customer_id} for {reason} ---")
-        return f"Instant refund of ${amount} processed for customer {customer_id}. Reason: {reason}. Funds will appear in 1-3 business days."
-    except:
-        return "Error: Please provide refund details as customer_id,amount,reason"
-
-def exonerate_driver(driver_details: str) -> str:
-    """Clear driver of fault with documentation."""
-    driver_id, reason = driver_details.split(',', 1) if ',' in driver_details else (driver_details, "Evidence supports innocence")
-    print(f"--- Exonerating Driver {driver_id}: {reason} ---")
-    return f"Driver {driver_id} cleared of all fault. Reason: {reason}. No impact on performance record."
-
-def log_merchant_packaging_feedback(feedback_details: str) -> str:
-    """Log detailed merchant feedback for quality improvement."""
-    try:
-        merchant_id, feedback = feedback_details.split(',', 1)
-        print(f"--- Logging Merchant Feedback: {merchant_id} ---")
-        return f"Quality feedback logged for merchant {merchant_id}: '{feedback}'. Forwarded to merchant quality team for review and improvement action."
-    except:
-        return "Error: Please provide feedback as merchant_id,feedback_details"
+    """Offer voucher or credits as compensation. Only after negotiation failed or as part of a negotiated settlement."""
+    fields = _parse_fields(voucher_details, 3)
+    if fields is None:
+        return VOUCHER_FORMAT_ERROR
+    customer_id, amount, voucher_type = fields
+    _trace("--- Offering Voucher: %s worth %s to %s ---", voucher_type, amount, customer_id)
+    return f"Successfully issued {voucher_type} voucher worth ${amount} to customer {customer_id}. Valid for 30 days, applicable to future orders."
 
 def log_incident_report(incident_details: str) -> str:
     """Create comprehensive incident report."""
-    try:
-        incident_type, details, parties = incident_details.split(',', 2)
-        print(f"--- Creating Incident Report: {incident_type} ---")
-        return f"Incident report #{random.randint(10000,99999)} created. Type: {incident_type}. Details logged for analysis. Involved parties: {parties}. Report forwarded to quality assurance team."
-    except:
-        return "Error: Please provide incident details as incident_type,details,involved_parties"
+    fields = _parse_fields(incident_details, 3)
+    if fields is None:
+        return INCIDENT_FORMAT_ERROR
+    incident_type, details, parties = fields
+    _trace("--- Creating Incident Report: %s ---", incident_type)
+    return f"Incident report #{_RNG.randint(10000,99999)} created. Type: {incident_type}. Details logged for analysis. Involved parties: {parties}. Report forwarded to quality assurance team."
 
 def escalate_to_human(escalation_request: str) -> str:
     """Escalate complex cases to human agents."""
-    try:
-        reason, urgency, summary = escalation_request.split(',', 2)
-        print(f"--- Escalating to Human Agent: {urgency} priority ---")
-        return f"Case escalated to human agent. Priority: {urgency}. Reason: {reason}. Case summary provided. Expected response time: {'30 minutes' if urgency == 'high' else '2 hours' if urgency == 'medium' else '24 hours'}."
-    except:
+    fields = _parse_fields(escalation_request, 3)
+    if fields is None:
         return "Case escalated to human agent team for specialized handling."
+    reason, urgency, summary = fields
+    _trace("--- Escalating to Human Agent: %s priority ---", urgency)
+    return f"Case escalated to human agent. Priority: {urgency}. Reason: {reason}. Case summary provided. Expected response time: {'30 minutes' if urgency == 'high' else '2 hours' if urgency == 'medium' else '24 hours'}."
+
+# Simulated traffic conditions for check_traffic, each following "Traffic Status for <location>: "
+_TRAFFIC_CONDITIONS = (
+    "Light traffic, normal flow. Expected delivery time on schedule.",
+    "Moderate congestion detected. +5-8 minutes delay expected.",
+    "Heavy traffic due to construction. +15-20 minutes delay likely.",
+    "Severe congestion - accident reported. +25-30 minutes delay. Rerouting recommended.",
+    "Road closure in effect. Alternative route required. +10-15 minutes delay."
+)
 
 def check_traffic(location: str, route: str = "") -> str:
     """Check current traffic conditions for a specific location and route."""
-    print(f"--- Checking Traffic Conditions: {location} ---")
-    
-    # Simulate traffic conditions
-    traffic_conditions = [
-        f"Traffic Status for {location}: Light traffic, normal flow. Expected delivery time on schedule.",
-        f"Traffic Status for {location}: Moderate congestion detected. +5-8 minutes delay expected.",
-        f"Traffic Status for {location}: Heavy traffic due to construction. +15-20 minutes delay likely.",
-        f"Traffic Status for {location}: Severe congestion - accident reported. +25-30 minutes delay. Rerouting recommended.",
-        f"Traffic Status for {location}: Road closure in effect. Alternative route required. +10-15 minutes delay."
-    ]
+    _trace("--- Checking Traffic Conditions: %s ---", location)
     
     route_info = f" Route: {route}" if route else ""
     
-    return f"{random.choice(traffic_conditions)}{route_info}\n\nRecommendation: {'Consider alternative routes' if 'Heavy' in traffic_conditions[-1] or 'Severe' in traffic_conditions[-1] else 'Current route optimal'}"
+    return f"Traffic Status for {location}: {_RNG.choice(_TRAFFIC_CONDITIONS)}{route_info}\n\nRecommendation: {'Consider alternative routes' if 'Heavy' in _TRAFFIC_CONDITIONS[-1] or 'Severe' in _TRAFFIC_CONDITIONS[-1] else 'Current route optimal'}"
+
+@functools.lru_cache(maxsize=512)
+def _merchant_record(merchant_id: str):
+    """Memoized sandbox merchant row (None if unknown); only the queue and prep time vary per call"""
+    return _load_sandbox().sandbox_db.get_merchant_details(merchant_id)
+
+def _merchant_cuisine(merchant: dict) -> str:
+    """Cuisine of a sandbox merchant row, stored as its type (e.g. 'multi_cuisine')"""
+    return merchant['type'].replace('_', ' ')
+
+_PREP_TIMES = (8, 12, 15, 18, 25)
+_QUEUE_LENGTHS = (2, 5, 8, 12, 15)
+
+# Fallback status options, filled with the merchant id
+_MERCHANT_STATUSES = (
+    "Merchant {merchant_id}: OPEN - Normal operations, 8-12 min prep time, 3 orders in queue",
+    "Merchant {merchant_id}: BUSY - High demand, 15-20 min prep time, 8 orders in queue",
+    "Merchant {merchant_id}: SLOW - Kitchen delays, 20-25 min prep time, 12 orders in queue",
+    "Merchant {merchant_id}: TEMPORARILY CLOSED - Kitchen maintenance, reopening in 30 minutes",
+    "Merchant {merchant_id}: LIMITED MENU - Some items unavailable, normal prep times",
+)
 
 def get_merchant_status(merchant_id: str) -> str:
     """Get current operational status of a specific merchant."""
-    print(f"--- Checking Merchant Status: {merchant_id} ---")
-    
-    if SANDBOX_AVAILABLE:
-        # Try to get merchant from sandbox
-        try:
-            merchant_data = sandbox_db.get_merchant(merchant_id)
-            if merchant_data:
-                prep_time = random.choice([8, 12, 15, 18, 25])
-                queue_length = random.choice([2, 5, 8, 12, 15])
-                
-                return f"""Merchant Status - {merchant_data['name']}:
+    _trace("--- Checking Merchant Status: %s ---", merchant_id)
+    
+    sandbox = _load_sandbox()
+    if sandbox:
+        # Unknown merchants get a simulated status below
+        merchant_data = _merchant_record(merchant_id)
+        if merchant_data:
+            prep_time = _RNG.choice(_PREP_TIMES)
+            queue_length = _RNG.choice(_QUEUE_LENGTHS)
+            
+            return f"""Merchant Status - {merchant_data['name']}:
 • Operational Status: OPEN
 • Current Queue: {queue_length} orders
 • Average Prep Time: {prep_time} minutes
 • Quality Rating: {merchant_data['rating']}/5.0
-• Cuisine: {merchant_data['cuisine_type']}
+• Cuisine: {_merchant_cuisine(merchant_data).title()}
 • Location: {merchant_data['address']}
 • Special Notes: {'Rush hour - slight delays expected' if queue_length > 10 else 'Normal operations'}"""
-        except:
-            pass
-    
-    # Fallback status options
-    statuses = [
-        f"Merchant {merchant_id}: OPEN - Normal operations, 8-12 min prep time, 3 orders in queue",
-        f"Merchant {merchant_id}: BUSY - High demand, 15-20 min prep time, 8 orders in queue", 
-        f"Merchant {merchant_id}: SLOW - Kitchen delays, 20-25 min prep time, 12 orders in queue",
-        f"Merchant {merchant_id}: TEMPORARILY CLOSED - Kitchen maintenance, reopening in 30 minutes",
-        f"Merchant {merchant_id}: LIMITED MENU - Some items unavailable, normal prep times"
-    ]
     
-    return random.choice(statuses)
+    return _RNG.choice(_MERCHANT_STATUSES).format_map({"merchant_id": merchant_id})
 
 def reroute_driver(driver_id: str, new_route: str) -> str:
     """Reroute driver to avoid traffic or optimize delivery path."""
-    print(f"--- Rerouting Driver {driver_id}: {new_route} ---")
+    _trace("--- Rerouting Driver %s: %s ---", driver_id, new_route)
     
     # Simulate route optimization
-    original_eta = random.randint(12, 25)
-    optimized_eta = max(8, original_eta - random.randint(3, 8))
-    distance_saved = round(random.uniform(0.5, 2.3), 1)
+    original_eta = _RNG.randint(12, 25)
+    optimized_eta = max(8, original_eta - _RNG.randint(3, 8))
+    distance_saved = round(_RNG.uniform(0.5, 2.3), 1)
     
     return f"""Driver Rerouting Successful:
 • Driver ID: {driver_id}
@@ -1005,45 +1301,53 @@ def reroute_driver(driver_id: str, new_route: str) -> str:
 • Route Status: Driver notified and navigation updated
 • Customer Notification: Auto-sent with updated delivery time"""
 
+@functools.lru_cache(maxsize=256)
+def _merchants_serving(cuisine: str) -> tuple:
+    """Memoized (name, cuisine) of sandbox merchants whose cuisine contains cuisine; all of them if empty"""
+    return tuple(
+        (merchant['name'], _merchant_cuisine(merchant))
+        for merchant in _load_sandbox().sandbox_db.merchants.values()
+        if cuisine in _merchant_cuisine(merchant).lower()
+    )
+
+# Fallback suggestions for get_nearby_merchants as (name, distance/ETA/rating)
+_SAMPLE_MERCHANTS = (
+    ("Spice Garden", "0.8km away, ~20min delivery, 4.5★"),
+    ("Quick Bites Express", "1.2km away, ~15min delivery, 4.3★"),
+    ("Golden Fork Restaurant", "1.5km away, ~25min delivery, 4.7★"),
+    ("Street Food Corner", "0.5km away, ~12min delivery, 4.2★"),
+    ("Fusion Kitchen", "2.1km away, ~30min delivery, 4.6★"),
+)
+
 def get_nearby_merchants(location: str, cuisine_type: str = "") -> str:
     """Find nearby merchants based on location and cuisine preference."""
-    print(f"--- Finding Nearby Merchants: {location}, Cuisine: {cuisine_type} ---")
-    
-    if SANDBOX_AVAILABLE:
-        try:
-            # Get merchants from sandbox
-            merchants = []
-            for merchant in sandbox_db.merchants.values():
-                if not cuisine_type or cuisine_type.lower() in merchant['cuisine_type'].lower():
-                    distance = round(random.uniform(0.3, 3.5), 1)
-                    eta = random.randint(15, 35)
-                    merchants.append(f"• {merchant['name']} - {merchant['cuisine_type']} ({distance}km, ~{eta}min delivery)")
-            
-            if merchants:
-                return f"Nearby Merchants in {location}:\n" + "\n".join(merchants[:5])
-        except:
-            pass
+    _trace("--- Finding Nearby Merchants: %s, Cuisine: %s ---", location, cuisine_type)
+    
+    sandbox = _load_sandbox()
+    if sandbox:
+        # Get merchants from sandbox
+        merchants = [
+            f"• {name} - {cuisine} ({round(_RNG.uniform(0.3, 3.5), 1)}km, ~{_RNG.randint(15, 35)}min delivery)"
+            for name, cuisine in _merchants_serving(cuisine_type.lower())[:5]
+        ]
+        
+        if merchants:
+            return f"Nearby Merchants in {location}:\n" + "\n".join(merchants)
     
     # Fallback merchant suggestions
     cuisine_filter = f" ({cuisine_type})" if cuisine_type else ""
+    suggestions = _RNG.sample(_SAMPLE_MERCHANTS, min(4, len(_SAMPLE_MERCHANTS)))
     
-    sample_merchants = [
-        f"• Spice Garden{cuisine_filter} - 0.8km away, ~20min delivery, 4.5★",
-        f"• Quick Bites Express{cuisine_filter} - 1.2km away, ~15min delivery, 4.3★", 
-        f"• Golden Fork Restaurant{cuisine_filter} - 1.5km away, ~25min delivery, 4.7★",
-        f"• Street Food Corner{cuisine_filter} - 0.5km away, ~12min delivery, 4.2★",
-        f"• Fusion Kitchen{cuisine_filter} - 2.1km away, ~30min delivery, 4.6★"
-    ]
-    
-    return f"Nearby Merchants in {location}:\n" + "\n".join(random.sample(sample_merchants, min(4, len(sample_merchants))))
+    return f"Nearby Merchants in {location}:\n" + "\n".join(f"• {name}{cuisine_filter} - {details}" for name, details in suggestions)
 
 def initiate_mediation_flow(order_id: str) -> str:
     """Start mediation process between customer, merchant, and driver for complex disputes."""
-    print(f"--- Initiating Mediation Flow: {order_id} ---")
+    _trace("--- Initiating Mediation Flow: %s ---", order_id)
     
-    if SANDBOX_AVAILABLE:
+    sandbox = _load_sandbox()
+    if sandbox:
         try:
-            order_data = sandbox_db.get_order(order_id)
+            order_data = sandbox.sandbox_db.get_order(order_id)
             if order_data:
                 customer_id = order_data['customer_id'] 
                 merchant_id = order_data['merchant_id']
@@ -1067,7 +1371,7 @@ def initiate_mediation_flow(order_id: str) -> str:
 
 📞 CONTACT ASSIGNED:
 • Mediation Specialist: Sarah Chen
-• Case Number: MED-{random.randint(1000,9999)}
+• Case Number: MED-{_RNG.randint(1000,9999)}
 • Expected Resolution: 48-72 hours
 • All parties will receive updates via SMS/email"""
         except:
@@ -1079,34 +1383,27 @@ def initiate_mediation_flow(order_id: str) -> str:
 • Evidence review period: 24 hours
 • Mediation specialist assigned
 • Expected resolution: 48-72 hours
-• Case reference: MED-{random.randint(1000,9999)}"""
+• Case reference: MED-{_RNG.randint(1000,9999)}"""
+
+# Simulated GrabLocker sites for find_nearby_locker
+_LOCKER_SITES = ("Central Mall", "Metro Station Plaza", "Office Complex Hub", "University Campus", "Residential Tower")
 
 def find_nearby_locker(location: str) -> str:
     """Find nearby Grab lockers for self-pickup or alternative delivery."""
-    print(f"--- Finding Nearby Lockers: {location} ---")
-    
-    # Simulate locker locations
-    locker_options = [
-        f"📍 GrabLocker @ Central Mall, {location}",
-        f"📍 GrabLocker @ Metro Station Plaza, {location}", 
-        f"📍 GrabLocker @ Office Complex Hub, {location}",
-        f"📍 GrabLocker @ University Campus, {location}",
-        f"📍 GrabLocker @ Residential Tower, {location}"
-    ]
-    
-    selected_lockers = random.sample(locker_options, min(3, len(locker_options)))
-    
-    locker_details = []
-    for i, locker in enumerate(selected_lockers):
-        distance = round(random.uniform(0.2, 1.8), 1)
-        available_slots = random.randint(3, 15)
-        walk_time = random.randint(2, 8)
-        
-        locker_details.append(f"{locker}\n  • Distance: {distance}km ({walk_time}min walk)\n  • Available Slots: {available_slots}\n  • Operating Hours: 6:00 AM - 11:00 PM")
+    _trace("--- Finding Nearby Lockers: %s ---", location)
+    
+    # Draw the lockers and all their simulated figures up front
+    sites = _RNG.sample(_LOCKER_SITES, min(3, len(_LOCKER_SITES)))
+    figures = [(round(_RNG.uniform(0.2, 1.8), 1), _RNG.randint(3, 15), _RNG.randint(2, 8)) for _ in sites]
+    
+    locker_details = "\n".join(
+        f"📍 GrabLocker @ {site}, {location}\n  • Distance: {distance}km ({walk_time}min walk)\n  • Available Slots: {available_slots}\n  • Operating Hours: 6:00 AM - 11:00 PM"
+        for site, (distance, available_slots, walk_time) in zip(sites, figures)
+    )
     
     return f"""Nearby GrabLockers in {location}:
 
-{chr(10).join(locker_details)}
+{locker_details}
 
 💡 LOCKER BENEFITS:
 • No delivery fee for locker pickup
@@ -1119,7 +1416,7 @@ Would you like me to redirect your order to one of these lockers?"""
 
 def analyze_image_evidence(image_context: str) -> str:
     """Analyze image evidence provided by customer for complaint investigation."""
-    print(f"--- Analyzing Image Evidence: {image_context} ---")
+    _trace("--- Analyzing Image Evidence: %s ---", image_context)
     
     # Extract image analysis information if provided
     if "Image Evidence:" in image_context:
@@ -1167,111 +1464,77 @@ With supporting visual evidence, we can proceed with confident resolution:
 
 The provided image evidence strengthens the case for immediate customer compensation."""
 
-def orchestrate_resolution_plan(issue_details: str) -> str:
-    """Create and execute a comprehensive multi-step resolution plan with proactive problem detection."""
-    print(f"--- Orchestrating Resolution Plan: {issue_details} ---")
-    
-    details_lower = issue_details.lower()
-    
-    # Advanced issue classification with severity scoring
-    severity_score = 0
-    issue_type = "general"
-    emotional_indicators = []
-    
-    # Critical issues (100 points)
-    if any(critical in details_lower for critical in ["spilled", "poisoned", "allergic", "sick", "emergency"]):
-        severity_score = 100
-        issue_type = "critical_failure"
-    
-    # High severity (75 points)
-    elif any(high in details_lower for high in ["wrong order", "missing", "damaged", "terrible", "awful", "disgusted"]):
-        severity_score = 75
-        issue_type = "major_service_failure"
-    
-    # Medium severity (50 points)
-    elif any(medium in details_lower for medium in ["cold", "late", "delayed", "poor quality", "disappointed"]):
-        severity_score = 50
-        issue_type = "quality_issue"
-    
-    # Low severity (25 points)
-    else:
-        severity_score = 25
-        issue_type = "minor_concern"
-    
-    # Detect emotional indicators
-    if any(anger in details_lower for anger in ["angry", "furious", "outraged", "disgusted"]):
-        emotional_indicators.append("high_anger")
-        severity_score += 15
-    elif any(frustration in details_lower for frustration in ["frustrated", "annoyed", "disappointed"]):
-        emotional_indicators.append("frustration")
-        severity_score += 10
-    
-    # Detect repeat customer signals
-    if any(repeat in details_lower for repeat in ["again", "always", "every time", "repeatedly"]):
-        emotional_indicators.append("repeat_issue")
-        severity_score += 20
-    
-    # Create dynamic resolution plan
-    plan_steps = []
-    compensation_level = "standard"
-    
-    if severity_score >= 90:
-        compensation_level = "premium_plus"
-        plan_steps = [
+# Resolution plans of orchestrate_resolution_plan as (minimum severity score,
+# compensation level, steps), highest first; steps are pre-numbered at import
+_RESOLUTION_PLANS = tuple(
+    (threshold, level, "\n".join(f"{i}. {step}" for i, step in enumerate(steps, 1)))
+    for threshold, level, steps in (
+        (90, "premium_plus", (
             "🚨 IMMEDIATE ESCALATION: Critical service failure detected",
             "💳 Full refund + 200% compensation credit",
             "🎁 Premium customer care package",
             "📞 Personal follow-up call within 2 hours",
             "🛡️ Quality assurance investigation",
-            "📊 Executive team notification"
-        ]
-    elif severity_score >= 70:
-        compensation_level = "premium"
-        plan_steps = [
-            "⚡ HIGH PRIORITY: Major service failure acknowledged", 
+            "📊 Executive team notification",
+        )),
+        (70, "premium", (
+            "⚡ HIGH PRIORITY: Major service failure acknowledged",
             "💳 Full refund + 150% compensation credit",
             "🚀 Immediate reorder (if applicable)",
             "📧 Personal apology from management",
             "🔍 Root cause analysis",
-            "📈 Process improvement review"
-        ]
-    elif severity_score >= 45:
-        compensation_level = "enhanced"
-        plan_steps = [
+            "📈 Process improvement review",
+        )),
+        (45, "enhanced", (
             "🎯 STANDARD RESOLUTION: Quality issue identified",
-            "💳 Full refund + 100% compensation credit", 
+            "💳 Full refund + 100% compensation credit",
             "🎁 Future order discount voucher",
             "📝 Merchant feedback submission",
-            "📊 Quality monitoring alert"
-        ]
-    else:
-        compensation_level = "basic"
-        plan_steps = [
+            "📊 Quality monitoring alert",
+        )),
+        (0, "basic", (
             "✅ QUICK RESOLUTION: Minor concern addressed",
             "💳 Partial refund or service credit",
             "🎫 Goodwill voucher",
-            "📋 Standard feedback logging"
-        ]
-    
-    emotional_response = ""
-    if "high_anger" in emotional_indicators:
-        emotional_response = "\n🤝 EMOTIONAL SUPPORT: Extra empathy protocols activated - customer anger management approach"
-    elif "frustration" in emotional_indicators:
-        emotional_response = "\n😊 CUSTOMER CARE: Frustration acknowledged - enhanced communication mode"
-    
-    if "repeat_issue" in emotional_indicators:
-        emotional_response += "\n🔄 REPEAT CUSTOMER ALERT: Pattern detected - priority handling + retention measures"
-    
-    return f"""🧠 ADVANCED RESOLUTION ORCHESTRATION:
+            "📋 Standard feedback logging",
+        )),
+    )
+)
+
+# Emotional signals of orchestrate_resolution_plan as (category, indicator, score
+# bonus, response line). Anger and frustration are exclusive, with anger winning;
+# a repeat issue adds to either.
+_EMOTION_SIGNALS = (
+    ("plan:anger", "high_anger", 15, "\n🤝 EMOTIONAL SUPPORT: Extra empathy protocols activated - customer anger management approach"),
+    ("plan:frustration", "frustration", 10, "\n😊 CUSTOMER CARE: Frustration acknowledged - enhanced communication mode"),
+    ("plan:repeat", "repeat_issue", 20, "\n🔄 REPEAT CUSTOMER ALERT: Pattern detected - priority handling + retention measures"),
+)
+_ANGER, _FRUSTRATION = 1 << 0, 1 << 1
+
+def _emotion_profile(mask: int):
+    """(indicators text, score bonus, response) for a bitmask of found _EMOTION_SIGNALS"""
+    if mask & _ANGER:
+        mask &= ~_FRUSTRATION
+    signals = [signal for bit, signal in enumerate(_EMOTION_SIGNALS) if mask >> bit & 1]
+    return (
+        ", ".join(indicator for _, indicator, _, _ in signals) or "None detected",
+        sum(bonus for _, _, bonus, _ in signals),
+        "".join(response for _, _, _, response in signals),
+    )
+
+# Every combination of signals, indexed by its bitmask
+_EMOTION_PROFILES = tuple(_emotion_profile(mask) for mask in range(1 << len(_EMOTION_SIGNALS)))
+
+RESOLUTION_REPORT_TEMPLATE = """🧠 ADVANCED RESOLUTION ORCHESTRATION:
 
 🎯 ISSUE CLASSIFICATION:
 • Severity Score: {severity_score}/100
-• Issue Type: {issue_type.replace('_', ' ').title()}
-• Compensation Level: {compensation_level.replace('_', ' ').title()}
-• Emotional Indicators: {', '.join(emotional_indicators) if emotional_indicators else 'None detected'}
+• Issue Type: {issue_type}
+• Compensation Level: {compensation_level}
+• Emotional Indicators: {emotional_indicators}
 
 📋 MULTI-STEP EXECUTION PLAN:
-{chr(10).join([f'{i+1}. {step}' for i, step in enumerate(plan_steps)])}
+{plan_text}
 
 {emotional_response}
 
@@ -1283,31 +1546,89 @@ def orchestrate_resolution_plan(issue_details: str) -> str:
 
 ✅ EXECUTION STATUS: Plan activated - all steps proceeding simultaneously for fastest resolution."""
 
+# Base severity of orchestrate_resolution_plan as (category, score, issue type),
+# checked in order; the last entry applies when no category matches
+_SEVERITY_LEVELS = (
+    ("plan:critical", 100, "critical_failure"),
+    ("plan:high", 75, "major_service_failure"),
+    ("plan:medium", 50, "quality_issue"),
+    (None, 25, "minor_concern"),
+)
+
+def _resolution_report(base_score: int, issue_type: str, emotion_mask: int) -> str:
+    emotional_indicators, emotion_bonus, emotional_response = _EMOTION_PROFILES[emotion_mask]
+    severity_score = base_score + emotion_bonus
+    
+    # Pick the resolution plan for the severity score
+    for threshold, compensation_level, plan_text in _RESOLUTION_PLANS:
+        if severity_score >= threshold:
+            break
+    
+    return RESOLUTION_REPORT_TEMPLATE.format_map({
+        "severity_score": severity_score,
+        "issue_type": issue_type.replace('_', ' ').title(),
+        "compensation_level": compensation_level.replace('_', ' ').title(),
+        "emotional_indicators": emotional_indicators,
+        "plan_text": plan_text,
+        "emotional_response": emotional_response,
+    })
+
+# The report depends only on the base severity and the emotional signals, so every
+# possible report is rendered at import, keyed by (issue type, emotion bitmask)
+_RESOLUTION_REPORTS = {
+    (issue_type, emotion_mask): _resolution_report(base_score, issue_type, emotion_mask)
+    for _, base_score, issue_type in _SEVERITY_LEVELS
+    for emotion_mask in range(len(_EMOTION_PROFILES))
+}
+
+def orchestrate_resolution_plan(issue_details: str) -> str:
+    """Create and execute a comprehensive multi-step resolution plan with proactive problem detection."""
+    _trace("--- Orchestrating Resolution Plan: %s ---", issue_details)
+    
+    _, found = _analyze(issue_details)
+    
+    # Advanced issue classification with severity scoring
+    for category, _, issue_type in _SEVERITY_LEVELS:
+        if category is None or category in found:
+            break
+    
+    # Detect emotional indicators and repeat customer signals
+    emotion_mask = sum(1 << bit for bit, signal in enumerate(_EMOTION_SIGNALS) if signal[0] in found)
+    
+    return _RESOLUTION_REPORTS[issue_type, emotion_mask]
+
+
+# Rupee amounts such as "₹450", "rs 450" or "450 rupees" in a lowercased message
+_MONEY_RE = re.compile(r'₹(\d+)|rs\s*(\d+)|(\d+)\s*rupees')
+
+# Simulated order values when the message names none
+_SIMULATED_ORDER_VALUES = (250, 350, 450, 550, 650, 750, 850, 950)
 
 def gather_compensation_details(customer_query: str) -> str:
     """
     Gather order value and customer expectations before negotiating compensation.
     Business-focused approach to understand customer needs and order context.
+    Only used when the customer explicitly asks for a refund/compensation - never proactively.
     """
-    print(f"--- Gathering Compensation Details for: {customer_query} ---")
+    _trace("--- Gathering Compensation Details for: %s ---", customer_query)
+    
+    query_lower, found = _analyze(customer_query)
     
     # Extract order value if mentioned
     order_value = None
-    if "₹" in customer_query or "rs" in customer_query.lower() or "rupees" in customer_query.lower():
-        import re
-        amount_match = re.search(r'₹(\d+)|rs\s*(\d+)|(\d+)\s*rupees', customer_query.lower())
-        if amount_match:
-            order_value = int(amount_match.group(1) or amount_match.group(2) or amount_match.group(3))
+    amount_match = _MONEY_RE.search(query_lower)
+    if amount_match:
+        order_value = int(amount_match.group(1) or amount_match.group(2) or amount_match.group(3))
     
     # Default order value for simulation
     if not order_value:
-        order_value = random.choice([250, 350, 450, 550, 650, 750, 850, 950])
+        order_value = _RNG.choice(_SIMULATED_ORDER_VALUES)
     
     # Determine issue type for context
     issue_severity = "medium"
-    if any(word in customer_query.lower() for word in ["completely wrong", "terrible", "disgusting", "awful", "horrible"]):
+    if "severity:high" in found:
         issue_severity = "high"
-    elif any(word in customer_query.lower() for word in ["slightly", "minor", "small", "bit"]):
+    elif "severity:low" in found:
         issue_severity = "low"
     
     return f"""💼 COMPENSATION ASSESSMENT REQUIRED:
@@ -1334,55 +1655,39 @@ To provide fair compensation, I need to understand:
 ⚡ NEXT STEP: Use negotiate_fair_compensation() after gathering customer preferences."""
 
 
-def negotiate_fair_compensation(order_details: str) -> str:
-    """
-    Negotiate fair compensation that balances customer satisfaction with business interests.
-    Uses dynamic pricing based on issue type, order value, and business constraints.
-    """
-    print(f"--- Negotiating Fair Compensation: {order_details} ---")
-    
-    # Extract order value from details
-    order_value = 500  # Default
-    if "₹" in order_details:
-        import re
-        match = re.search(r'₹(\d+)', order_details)
-        if match:
-            order_value = int(match.group(1))
-    
-    # Determine issue type and calculate base compensation (CAPPED AT 50%)
-    issue_type = "general"
-    base_percentage = 25  # More conservative starting point
-    
-    if any(word in order_details.lower() for word in ["wrong", "incorrect", "different"]):
-        issue_type = "wrong_order"
-        base_percentage = 30
-    elif any(word in order_details.lower() for word in ["spilled", "damaged", "cold", "soggy"]):
-        issue_type = "quality_issue"
-        base_percentage = 40
-    elif any(word in order_details.lower() for word in ["late", "delay", "waiting"]):
-        issue_type = "delivery_delay"
-        base_percentage = 15
-    elif any(word in order_details.lower() for word in ["missing", "incomplete"]):
-        issue_type = "missing_items"
-        base_percentage = 35
-    
-    # Calculate compensation with MAXIMUM 50% CAP
-    base_compensation = int(order_value * base_percentage / 100)
-    delivery_cost = random.choice([45, 50, 55, 60])  # Average delivery cost
-    goodwill_voucher = random.choice([30, 40, 50])  # Smaller goodwill gesture
-    
-    # Create negotiation tiers - MAXIMUM 50% of order value
-    tier_1_offer = base_compensation
-    tier_2_offer = min(base_compensation + 30, int(order_value * 0.4))  # Max 40% in tier 2
-    tier_3_offer = min(int(order_value * 0.5), base_compensation + 60)  # HARD CAP AT 50%
-    
-    customer_satisfaction_score = random.choice([75, 80, 85, 90])
-    
-    return f"""🤝 CONSERVATIVE COMPENSATION NEGOTIATION:
+def _rupee_amount(text: str, default: int) -> int:
+    """First "₹<digits>" amount in text, such as "₹450", or default."""
+    _, sep, rest = text.partition("₹")
+    while sep:
+        end = 0
+        while end < len(rest) and rest[end].isdecimal():
+            end += 1
+        if end:
+            return int(rest[:end])
+        _, sep, rest = rest.partition("₹")
+    return default
+
+# Starting compensation (% of order value) by issue type, all well under the 50% cap;
+# "general" is the more conservative starting point
+NEGOTIATION_BASE_PERCENTAGES = {
+    "wrong_order": 30,
+    "quality_issue": 40,
+    "delivery_delay": 15,
+    "missing_items": 35,
+    "general": 25,
+}
+
+# Average delivery cost per order, in ₹
+_DELIVERY_COSTS = (45, 50, 55, 60)
+_NEGOTIATION_GOODWILL_VOUCHERS = (30, 40, 50)  # Smaller goodwill gesture
+_NEGOTIATION_SATISFACTION_SCORES = (75, 80, 85, 90)
+
+# Report scaffold of negotiate_fair_compensation, filled with str.format_map
+NEGOTIATION_REPORT_TEMPLATE = """🤝 CONSERVATIVE COMPENSATION NEGOTIATION:
 
 📋 ASSESSMENT SUMMARY:
 • Order Value: ₹{order_value}
-• Issue Type: {issue_type.replace('_', ' ').title()}
+• Issue Type: {issue_label}
 • Affected Amount: ~₹{base_compensation} worth of items
 • Our Delivery Cost: ₹{delivery_cost}
 
@@ -1391,7 +1696,7 @@ def negotiate_fair_compensation(order_details: str) -> str:
 🎯 PRIMARY OFFER (Starting Point):
 • Cash Refund: ₹{tier_1_offer}
 • Goodwill Credit: ₹{goodwill_voucher}
-• Total Value: ₹{tier_1_offer + goodwill_voucher}
+• Total Value: ₹{tier_1_total}
 
 📈 ESCALATION TIERS (if customer requests more):
 • Tier 2: ₹{tier_2_offer} refund + ₹{goodwill_voucher} credit
@@ -1412,45 +1717,79 @@ def negotiate_fair_compensation(order_details: str) -> str:
 🎖️ CUSTOMER RETENTION PRIORITY: {customer_satisfaction_score}% satisfaction target
 🚦 APPROVAL STATUS: Pre-approved up to ₹{tier_3_offer} (50% maximum)"""
 
-
-def explain_business_compensation_policy(issue_type: str) -> str:
+def negotiate_fair_compensation(order_details: str) -> str:
     """
-    Explain Grab's compensation philosophy to help customers understand business constraints
-    while demonstrating empathy and fairness.
+    Negotiate fair compensation that balances customer satisfaction with business interests.
+    Uses dynamic pricing based on issue type, order value, and business constraints.
+    Hard cap of 50% of order value; a rejected offer goes to escalate_compensation_dissatisfaction.
     """
-    print(f"--- Explaining Compensation Policy for: {issue_type} ---")
-    
-    policies = {
-        "wrong_order": {
-            "coverage": "45-60% of order value",
-            "reasoning": "Covers unusable items while considering preparation and delivery costs already invested",
-            "typical_range": "₹200-400 for average orders"
-        },
-        "quality_issue": {
-            "coverage": "50-70% of affected items",
-            "reasoning": "Higher coverage for quality failures as this impacts trust and health",
-            "typical_range": "₹150-350 depending on severity"
-        },
-        "delivery_delay": {
-            "coverage": "₹50-150 credits",
-            "reasoning": "Food still delivered and usable, compensation for time inconvenience",
-            "typical_range": "₹75-125 for delays over 30 minutes"
-        },
-        "missing_items": {
-            "coverage": "60-80% of missing item value",
-            "reasoning": "Full item replacement cost plus inconvenience, as item not received",
-            "typical_range": "₹100-300 based on missing items"
-        }
-    }
+    _trace("--- Negotiating Fair Compensation: %s ---", order_details)
     
-    policy = policies.get(issue_type, policies["wrong_order"])
+    # Extract order value from details (default 500)
+    order_value = _rupee_amount(order_details, 500)
     
-    return f"""📋 GRAB'S FAIR COMPENSATION PHILOSOPHY:
+    # Determine issue type and calculate base compensation (CAPPED AT 50%)
+    _, found = _analyze(order_details)
+    issue_type = _classify_issue(found, "negotiate", "general")
+    base_percentage = NEGOTIATION_BASE_PERCENTAGES[issue_type]
+    
+    # Calculate compensation with MAXIMUM 50% CAP
+    base_compensation = order_value * base_percentage // 100
+    delivery_cost = _RNG.choice(_DELIVERY_COSTS)  # Average delivery cost
+    goodwill_voucher = _RNG.choice(_NEGOTIATION_GOODWILL_VOUCHERS)  # Smaller goodwill gesture
+    
+    # Create negotiation tiers - MAXIMUM 50% of order value
+    tier_1_offer = base_compensation
+    tier_2_offer = min(base_compensation + 30, order_value * 2 // 5)  # Max 40% in tier 2
+    tier_3_offer = min(order_value // 2, base_compensation + 60)  # HARD CAP AT 50%
+    
+    customer_satisfaction_score = _RNG.choice(_NEGOTIATION_SATISFACTION_SCORES)
+    
+    return NEGOTIATION_REPORT_TEMPLATE.format_map({
+        "order_value": order_value,
+        "issue_label": issue_type.replace("_", " ").title(),
+        "base_compensation": base_compensation,
+        "delivery_cost": delivery_cost,
+        "tier_1_offer": tier_1_offer,
+        "goodwill_voucher": goodwill_voucher,
+        "tier_1_total": tier_1_offer + goodwill_voucher,
+        "tier_2_offer": tier_2_offer,
+        "tier_3_offer": tier_3_offer,
+        "customer_satisfaction_score": customer_satisfaction_score,
+    })
+
+
+# Compensation policy explained to customers, by issue type (wrong_order is the default)
+COMPENSATION_POLICIES = {
+    "wrong_order": {
+        "coverage": "45-60% of order value",
+        "reasoning": "Covers unusable items while considering preparation and delivery costs already invested",
+        "typical_range": "₹200-400 for average orders"
+    },
+    "quality_issue": {
+        "coverage": "50-70% of affected items",
+        "reasoning": "Higher coverage for quality failures as this impacts trust and health",
+        "typical_range": "₹150-350 depending on severity"
+    },
+    "delivery_delay": {
+        "coverage": "₹50-150 credits",
+        "reasoning": "Food still delivered and usable, compensation for time inconvenience",
+        "typical_range": "₹75-125 for delays over 30 minutes"
+    },
+    "missing_items": {
+        "coverage": "60-80% of missing item value",
+        "reasoning": "Full item replacement cost plus inconvenience, as item not received",
+        "typical_range": "₹100-300 based on missing items"
+    }
+}
+
+# Report scaffold of explain_business_compensation_policy, filled with str.format_map
+POLICY_EXPLANATION_TEMPLATE = """📋 GRAB'S FAIR COMPENSATION PHILOSOPHY:
 
-🎯 FOR {issue_type.replace('_', ' ').upper()} ISSUES:
-• Coverage Range: {policy['coverage']}
-• Business Reasoning: {policy['reasoning']}
-• Typical Amounts: {policy['typical_range']}
+🎯 FOR {issue_label} ISSUES:
+• Coverage Range: {coverage}
+• Business Reasoning: {reasoning}
+• Typical Amounts: {typical_range}
 
 💼 WHY THESE AMOUNTS:
 ✅ Covers your direct loss and inconvenience
@@ -1472,106 +1811,145 @@ def explain_business_compensation_policy(issue_type: str) -> str:
 
 🎖️ RESULT: Satisfied customers + sustainable business = better service for everyone"""
 
-
-def calculate_dynamic_refund_amount(order_value: int, issue_type: str, customer_expectation: str = "reasonable") -> str:
+def explain_business_compensation_policy(issue_type: str) -> str:
     """
-    Calculate contextual refund amounts based on order value, issue severity, and business logic.
-    Provides justification for the amount to help with customer negotiation.
+    Explain Grab's compensation philosophy to help customers understand business constraints
+    while demonstrating empathy and fairness.
     """
-    print(f"--- Calculating Dynamic Refund: ₹{order_value} order, {issue_type} ---")
-    
-    # Base compensation percentages by issue type (CAPPED AT 50%)
-    compensation_matrix = {
-        "wrong_order": {"min": 25, "max": 40},
-        "quality_issue": {"min": 30, "max": 50},
-        "delivery_delay": {"min": 10, "max": 25},
-        "missing_items": {"min": 35, "max": 50},
-        "spilled_food": {"min": 35, "max": 50},
-        "cold_food": {"min": 20, "max": 35},
-        "damaged_packaging": {"min": 15, "max": 30}
-    }
-    
+    _trace("--- Explaining Compensation Policy for: %s ---", issue_type)
+    return _policy_explanation(issue_type)
+
+@functools.lru_cache(maxsize=256)
+def _policy_explanation(issue_type: str) -> str:
+    policy = COMPENSATION_POLICIES.get(issue_type, COMPENSATION_POLICIES["wrong_order"])
+    
+    return POLICY_EXPLANATION_TEMPLATE.format_map({
+        **policy,
+        "issue_label": issue_type.replace("_", " ").upper(),
+    })
+
+
+# Base compensation percentages by issue type (CAPPED AT 50%)
+REFUND_PERCENTAGE_RANGES = {
+    "wrong_order": {"min": 25, "max": 40},
+    "quality_issue": {"min": 30, "max": 50},
+    "delivery_delay": {"min": 10, "max": 25},
+    "missing_items": {"min": 35, "max": 50},
+    "spilled_food": {"min": 35, "max": 50},
+    "cold_food": {"min": 20, "max": 35},
+    "damaged_packaging": {"min": 15, "max": 30}
+}
+DEFAULT_REFUND_PERCENTAGE_RANGE = {"min": 40, "max": 60}
+
+_REFUND_GOODWILL_CREDITS = (50, 75, 100)
+_REFUND_DELIVERY_COSTS = _DELIVERY_COSTS[:3]
+_PLATFORM_COSTS = (25, 30, 35)
+_REFUND_CONFIDENCE_SCORES = (85, 90, 95)
+
+@functools.lru_cache(maxsize=256)
+def _refund_terms(issue_type: str, customer_expectation: str):
+    """(coverage percentage, tier) for an issue type and expectation; independent of the order value"""
     # Get compensation range
-    comp_range = compensation_matrix.get(issue_type, {"min": 40, "max": 60})
+    comp_range = REFUND_PERCENTAGE_RANGES.get(issue_type, DEFAULT_REFUND_PERCENTAGE_RANGE)
     
     # Adjust based on customer expectation but CAP AT 50%
-    if "full refund" in customer_expectation.lower() or "complete" in customer_expectation.lower():
-        percentage = min(comp_range["max"], 50)  # Never exceed 50%
-        tier = "maximum (50% cap)"
-    elif "partial" in customer_expectation.lower() or "some" in customer_expectation.lower():
-        percentage = comp_range["min"]
-        tier = "minimal"
+    expectation_lower = customer_expectation.lower()
+    if "full refund" in expectation_lower or "complete" in expectation_lower:
+        return min(comp_range["max"], 50), "maximum (50% cap)"  # Never exceed 50%
+    elif "partial" in expectation_lower or "some" in expectation_lower:
+        return comp_range["min"], "minimal"
     else:
-        percentage = (comp_range["min"] + min(comp_range["max"], 50)) // 2
-        tier = "standard"
-    
-    # Calculate amounts
-    refund_amount = int(order_value * percentage / 100)
-    goodwill_credit = random.choice([50, 75, 100])
-    delivery_cost = random.choice([45, 50, 55])
-    
-    # Business cost analysis
-    total_grab_cost = delivery_cost + random.choice([25, 30, 35])  # Platform costs
-    net_business_impact = refund_amount + goodwill_credit - (order_value - total_grab_cost)
-    
-    return f"""💰 DYNAMIC REFUND CALCULATION:
+        return (comp_range["min"] + min(comp_range["max"], 50)) // 2, "standard"
+
+# Report scaffold of calculate_dynamic_refund_amount, filled with str.format_map
+REFUND_CALCULATION_TEMPLATE = """💰 DYNAMIC REFUND CALCULATION:
 
 📊 ORDER ANALYSIS:
 • Order Value: ₹{order_value}
-• Issue Type: {issue_type.replace('_', ' ').title()}
-• Compensation Tier: {tier.title()}
+• Issue Type: {issue_label}
+• Compensation Tier: {tier_label}
 • Coverage Percentage: {percentage}%
 
 💳 RECOMMENDED COMPENSATION:
 • Primary Refund: ₹{refund_amount}
 • Goodwill Credit: ₹{goodwill_credit}
-• Total Customer Value: ₹{refund_amount + goodwill_credit}
+• Total Customer Value: ₹{customer_total}
 
 📈 BUSINESS IMPACT ANALYSIS:
 • Our Delivery Investment: ₹{delivery_cost}
 • Platform & Processing Costs: ₹{total_grab_cost}
-• Net Business Impact: ₹{abs(net_business_impact)} {'loss' if net_business_impact > 0 else 'manageable cost'}
+• Net Business Impact: ₹{impact_amount} {impact_label}
 
 🎯 NEGOTIATION RATIONALE:
 ✅ "This ₹{refund_amount} covers the unusable portion of your order"
 ✅ "The ₹{goodwill_credit} credit acknowledges your inconvenience"  
 ✅ "We're absorbing our ₹{total_grab_cost} operational costs"
-✅ "Total value of ₹{refund_amount + goodwill_credit} shows our commitment to making this right"
-
-🚦 APPROVAL STATUS: {"Pre-approved" if refund_amount <= order_value * 0.5 else "Exceeds 50% policy - requires escalation"}
-💡 CUSTOMER SATISFACTION TARGET: {random.choice([85, 90, 95])}% resolution confidence"""
+✅ "Total value of ₹{customer_total} shows our commitment to making this right"
 
+🚦 APPROVAL STATUS: {approval_status}
+💡 CUSTOMER SATISFACTION TARGET: {confidence_score}% resolution confidence"""
 
-def request_visual_evidence(issue_description: str) -> str:
+def calculate_dynamic_refund_amount(order_value: int, issue_type: str, customer_expectation: str = "reasonable") -> str:
     """
-    Request customer to provide photo evidence for better assessment
+    Calculate contextual refund amounts based on order value, issue severity, and business logic.
+    Provides justification for the amount to help with customer negotiation.
     """
-    print(f"--- Requesting Visual Evidence: {issue_description} ---")
+    _trace("--- Calculating Dynamic Refund: ₹%s order, %s ---", order_value, issue_type)
     
-    # Determine appropriate evidence request based on issue
-    issue_lower = issue_description.lower()
+    percentage, tier = _refund_terms(issue_type, customer_expectation)
     
-    if any(word in issue_lower for word in ["spill", "damage", "mess", "leak"]):
-        evidence_type = "spilled or damaged food"
-        specific_request = "Could you please share a photo showing the spilled/damaged food? This will help me understand exactly what happened and ensure we address this properly."
-        
-    elif any(word in issue_lower for word in ["wrong", "different", "mistake"]):
-        evidence_type = "wrong order items"
-        specific_request = "Could you please take a photo of what you received versus what you ordered? This visual evidence will help me verify the mix-up and arrange the correct resolution."
-        
-    elif any(word in issue_lower for word in ["packaging", "broken", "container"]):
-        evidence_type = "packaging condition"
-        specific_request = "Could you please share a photo of the packaging/container issue? This helps us identify if this is a restaurant packaging problem or delivery handling issue."
-        
-    elif any(word in issue_lower for word in ["quality", "bad", "terrible", "awful"]):
-        evidence_type = "food quality issue"
-        specific_request = "Could you please take a photo showing the quality issue with the food? Visual evidence helps us provide accurate feedback to the restaurant."
-        
-    else:
-        evidence_type = "order issue"
-        specific_request = "Could you please share a photo of the issue you're experiencing? Visual evidence helps me understand the situation better."
+    # Calculate amounts
+    refund_amount = order_value * percentage // 100
+    goodwill_credit = _RNG.choice(_REFUND_GOODWILL_CREDITS)
+    delivery_cost = _RNG.choice(_REFUND_DELIVERY_COSTS)
     
-    return f"""📸 **VISUAL EVIDENCE REQUEST**
+    # Business cost analysis
+    total_grab_cost = delivery_cost + _RNG.choice(_PLATFORM_COSTS)  # Platform costs
+    net_business_impact = refund_amount + goodwill_credit - (order_value - total_grab_cost)
+    
+    return REFUND_CALCULATION_TEMPLATE.format_map({
+        "order_value": order_value,
+        "issue_label": issue_type.replace("_", " ").title(),
+        "tier_label": tier.title(),
+        "percentage": percentage,
+        "refund_amount": refund_amount,
+        "goodwill_credit": goodwill_credit,
+        "customer_total": refund_amount + goodwill_credit,
+        "delivery_cost": delivery_cost,
+        "total_grab_cost": total_grab_cost,
+        "impact_amount": abs(net_business_impact),
+        "impact_label": "loss" if net_business_impact > 0 else "manageable cost",
+        "approval_status": "Pre-approved" if refund_amount * 2 <= order_value else "Exceeds 50% policy - requires escalation",
+        "confidence_score": _RNG.choice(_REFUND_CONFIDENCE_SCORES),
+    })
+
+
+# Photo requests of request_visual_evidence as (evidence type, request) by issue
+PHOTO_REQUESTS = {
+    "damaged_food": (
+        "spilled or damaged food",
+        "Could you please share a photo showing the spilled/damaged food? This will help me understand exactly what happened and ensure we address this properly.",
+    ),
+    "wrong_order": (
+        "wrong order items",
+        "Could you please take a photo of what you received versus what you ordered? This visual evidence will help me verify the mix-up and arrange the correct resolution.",
+    ),
+    "packaging": (
+        "packaging condition",
+        "Could you please share a photo of the packaging/container issue? This helps us identify if this is a restaurant packaging problem or delivery handling issue.",
+    ),
+    "food_quality": (
+        "food quality issue",
+        "Could you please take a photo showing the quality issue with the food? Visual evidence helps us provide accurate feedback to the restaurant.",
+    ),
+    "general": (
+        "order issue",
+        "Could you please share a photo of the issue you're experiencing? Visual evidence helps me understand the situation better.",
+    ),
+}
+
+# Reply scaffold of request_visual_evidence, filled with str.format_map
+VISUAL_EVIDENCE_TEMPLATE = """📸 **VISUAL EVIDENCE REQUEST**
 
 Thank you for bringing this to our attention. To ensure I provide you with the most appropriate resolution, I'd like to gather some visual evidence.
 
@@ -1592,41 +1970,59 @@ You can upload the image using the attachment button in this chat.
 
 Your feedback is valuable in helping us maintain service quality!"""
 
-
-def log_customer_feedback(feedback_details: str, evidence_provided: str = "none") -> str:
+def request_visual_evidence(issue_description: str) -> str:
     """
-    Log customer feedback without admitting fault - position as valuable improvement data
+    Request customer to provide photo evidence for better assessment
     """
-    print(f"--- Logging Customer Feedback: {feedback_details} ---")
+    _trace("--- Requesting Visual Evidence: %s ---", issue_description)
     
-    # Generate a feedback reference number
-    feedback_id = f"FB{random.randint(10000, 99999)}"
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Determine feedback category
-    details_lower = feedback_details.lower()
-    category = "General"
-    
-    if any(word in details_lower for word in ["spill", "damage", "mess"]):
-        category = "Delivery Handling"
-    elif any(word in details_lower for word in ["wrong", "different", "mistake"]):
-        category = "Order Accuracy"
-    elif any(word in details_lower for word in ["packaging", "container"]):
-        category = "Packaging Quality"
-    elif any(word in details_lower for word in ["quality", "food", "taste"]):
-        category = "Food Quality"
-    elif any(word in details_lower for word in ["late", "delay", "time"]):
-        category = "Delivery Timeliness"
-    
-    return f"""📋 **FEEDBACK LOGGED SUCCESSFULLY**
+    # Determine appropriate evidence request based on issue
+    _, found = _analyze(issue_description)
+    evidence_type, specific_request = PHOTO_REQUESTS[_classify_issue(found, "photo", "general")]
+    
+    return VISUAL_EVIDENCE_TEMPLATE.format_map({
+        "evidence_type": evidence_type,
+        "specific_request": specific_request,
+    })
+
+
+# (epoch second, formatted stamp) of the last report timestamp; reports only
+# show whole seconds, so strftime runs at most once per second
+_timestamp_cache = (-1, "")
+
+def _now_str() -> str:
+    global _timestamp_cache
+    second, stamp = _timestamp_cache
+    now = int(time.time())
+    if now != second:
+        stamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        _timestamp_cache = (now, stamp)
+    return stamp
+
+# (monotonic time, date) of the last voucher expiry; the date only changes
+# daily, so it is recomputed at most once a minute
+_expiry_cache = (float("-inf"), "")
+_VOUCHER_VALIDITY = timedelta(days=30)
+
+def _expiry_str() -> str:
+    global _expiry_cache
+    checked_at, expiry = _expiry_cache
+    now = time.monotonic()
+    if now - checked_at >= 60:
+        expiry = (datetime.now() + _VOUCHER_VALIDITY).strftime("%d %B %Y")
+        _expiry_cache = (now, expiry)
+    return expiry
+
+# Report scaffold of log_customer_feedback, filled with str.format_map
+FEEDBACK_LOG_TEMPLATE = """📋 **FEEDBACK LOGGED SUCCESSFULLY**
 
 ✅ **Feedback Reference:** {feedback_id}
 📅 **Logged At:** {current_time}
 🏷️ **Category:** {category}
-📸 **Evidence:** {"Photo evidence attached" if evidence_provided != "none" else "Description provided"}
+📸 **Evidence:** {evidence}
 
 🎯 **Your Feedback Summary:**
-"{feedback_details[:100]}..."
+"{feedback_preview}"
 
 💡 **Impact of Your Feedback:**
 • This information helps us identify improvement opportunities
@@ -1645,35 +2041,31 @@ Customer feedback like yours is essential for maintaining high service standards
 
 *Your feedback has been recorded and will be used for service improvement purposes.*"""
 
-
-def offer_goodwill_voucher(issue_type: str, customer_satisfaction_level: str = "dissatisfied") -> str:
+def log_customer_feedback(feedback_details: str, evidence_provided: str = "none") -> str:
     """
-    Offer conservative goodwill vouchers (70-90%) only for extremely dissatisfied customers
+    Log customer feedback without admitting fault - position as valuable improvement data
     """
-    print(f"--- Offering Goodwill Voucher: {issue_type}, satisfaction: {customer_satisfaction_level} ---")
+    _trace("--- Logging Customer Feedback: %s ---", feedback_details)
     
-    # Determine order value (simulated)
-    order_value = random.choice([200, 300, 400, 500, 600, 700, 800])
-    
-    # Conservative voucher amounts based on satisfaction level
-    if customer_satisfaction_level.lower() in ["extremely dissatisfied", "very upset", "angry"]:
-        voucher_percentage = 70
-        escalation_percentage = 90
-    elif customer_satisfaction_level.lower() in ["dissatisfied", "unhappy"]:
-        voucher_percentage = 50
-        escalation_percentage = 70
-    else:
-        voucher_percentage = 30
-        escalation_percentage = 50
-    
-    initial_voucher = int(order_value * voucher_percentage / 100)
-    max_voucher = int(order_value * escalation_percentage / 100)
+    # Generate a feedback reference number
+    feedback_id = _new_id("FB")
+    current_time = _now_str()
     
-    # Generate voucher code
-    voucher_code = f"GOODWILL{random.randint(1000, 9999)}"
-    expiry_date = (datetime.now() + timedelta(days=30)).strftime("%d %B %Y")
+    # Determine feedback category
+    _, found = _analyze(feedback_details)
+    category = _classify_issue(found, "feedback", "general").replace("_", " ").title()
     
-    return f"""🎁 **GOODWILL GESTURE OFFERED**
+    return FEEDBACK_LOG_TEMPLATE.format_map({
+        "feedback_id": feedback_id,
+        "current_time": current_time,
+        "category": category,
+        "evidence": "Photo evidence attached" if evidence_provided != "none" else "Description provided",
+        "feedback_preview": feedback_details if len(feedback_details) <= 100 else feedback_details[:100] + "...",
+    })
+
+
+# Reply scaffold of offer_goodwill_voucher, filled with str.format_map
+GOODWILL_VOUCHER_TEMPLATE = """🎁 **GOODWILL GESTURE OFFERED**
 
 I truly appreciate your patience and your valuable feedback. As a token of our commitment to service improvement, I'd like to offer you a goodwill voucher.
 
@@ -1702,29 +2094,50 @@ This isn't compensation for fault - it's our way of saying thank you for helping
 
 **Maximum possible goodwill voucher: ₹{max_voucher} if situation warrants**"""
 
+_VERY_DISSATISFIED_LEVELS = frozenset({"extremely dissatisfied", "very upset", "angry"})
+_DISSATISFIED_LEVELS = frozenset({"dissatisfied", "unhappy"})
 
-def escalate_to_customer_care_officer(escalation_reason: str, customer_issue: str) -> str:
+# Simulated order values for offer_goodwill_voucher
+_GOODWILL_ORDER_VALUES = (200, 300, 400, 500, 600, 700, 800)
+
+def offer_goodwill_voucher(issue_type: str, customer_satisfaction_level: str = "dissatisfied") -> str:
     """
-    Escalate to human customer care officer with proper handoff
+    Offer conservative goodwill vouchers (70-90%) only for extremely dissatisfied customers
     """
-    print(f"--- Escalating to Customer Care Officer: {escalation_reason} ---")
+    _trace("--- Offering Goodwill Voucher: %s, satisfaction: %s ---", issue_type, customer_satisfaction_level)
     
-    # Generate escalation details
-    escalation_id = f"ESC{random.randint(10000, 99999)}"
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Determine order value (simulated)
+    order_value = _RNG.choice(_GOODWILL_ORDER_VALUES)
     
-    # Simulated customer care officer (will add to sandbox later)
-    care_officers = [
-        {"name": "Sarah Chen", "id": "CO001", "specialization": "Delivery Issues", "rating": 4.8},
-        {"name": "Rajesh Kumar", "id": "CO002", "specialization": "Food Quality", "rating": 4.9},
-        {"name": "Maria Santos", "id": "CO003", "specialization": "Order Disputes", "rating": 4.7},
-        {"name": "David Johnson", "id": "CO004", "specialization": "Customer Relations", "rating": 4.8}
-    ]
+    # Conservative voucher amounts based on satisfaction level
+    satisfaction_lower = customer_satisfaction_level.lower()
+    if satisfaction_lower in _VERY_DISSATISFIED_LEVELS:
+        voucher_percentage = 70
+        escalation_percentage = 90
+    elif satisfaction_lower in _DISSATISFIED_LEVELS:
+        voucher_percentage = 50
+        escalation_percentage = 70
+    else:
+        voucher_percentage = 30
+        escalation_percentage = 50
     
-    assigned_officer = random.choice(care_officers)
-    estimated_wait = random.choice([3, 5, 7, 10])
+    initial_voucher = order_value * voucher_percentage // 100
+    max_voucher = order_value * escalation_percentage // 100
     
-    return f"""👤 **ESCALATION TO CUSTOMER CARE OFFICER**
+    # Generate voucher code
+    voucher_code = _new_id("GOODWILL")
+    expiry_date = _expiry_str()
+    
+    return GOODWILL_VOUCHER_TEMPLATE.format_map({
+        "initial_voucher": initial_voucher,
+        "voucher_code": voucher_code,
+        "expiry_date": expiry_date,
+        "max_voucher": max_voucher,
+    })
+
+
+# Handoff scaffold of escalate_to_customer_care_officer, filled with str.format_map
+CARE_ESCALATION_TEMPLATE = """👤 **ESCALATION TO CUSTOMER CARE OFFICER**
 
 I understand your concerns and want to ensure you receive the attention this matter deserves. I'm connecting you with one of our customer care specialists.
 
@@ -1734,10 +2147,10 @@ I understand your concerns and want to ensure you receive the attention this mat
 • **Reason:** {escalation_reason}
 
 👨‍💼 **Your Assigned Officer:**
-• **Name:** {assigned_officer['name']}
-• **ID:** {assigned_officer['id']}
-• **Specialization:** {assigned_officer['specialization']}
-• **Customer Rating:** {assigned_officer['rating']}⭐
+• **Name:** {officer[name]}
+• **ID:** {officer[id]}
+• **Specialization:** {officer[specialization]}
+• **Customer Rating:** {officer[rating]}⭐
 
 ⏰ **Connection Details:**
 • **Estimated Wait Time:** {estimated_wait} minutes
@@ -1751,41 +2164,49 @@ I understand your concerns and want to ensure you receive the attention this mat
 • Customer satisfaction concerns
 
 💡 **What to Expect:**
-• {assigned_officer['name']} has authority for enhanced resolutions
+• {officer[name]} has authority for enhanced resolutions
 • Can approve additional goodwill measures if warranted
 • Will provide personalized attention to your specific situation
 • Has access to supervisor-level tools and options
 
 🚀 **Preparing Transfer...**
-*Please hold while I connect you with {assigned_officer['name']}. Your conversation history and case details are being transferred now.*
+*Please hold while I connect you with {officer[name]}. Your conversation history and case details are being transferred now.*
 
-**Note:** {assigned_officer['name']} will be with you shortly and has full context of your situation."""
+**Note:** {officer[name]} will be with you shortly and has full context of your situation."""
 
+# Simulated customer care officers (will add to sandbox later)
+CARE_OFFICERS = (
+    {"name": "Sarah Chen", "id": "CO001", "specialization": "Delivery Issues", "rating": 4.8},
+    {"name": "Rajesh Kumar", "id": "CO002", "specialization": "Food Quality", "rating": 4.9},
+    {"name": "Maria Santos", "id": "CO003", "specialization": "Order Disputes", "rating": 4.7},
+    {"name": "David Johnson", "id": "CO004", "specialization": "Customer Relations", "rating": 4.8}
+)
+_CARE_WAIT_MINUTES = (3, 5, 7, 10)
 
-def escalate_compensation_dissatisfaction(customer_complaint: str, attempted_compensation: str = "50% of order value") -> str:
+def escalate_to_customer_care_officer(escalation_reason: str, customer_issue: str) -> str:
     """
-    Handle escalation when customer is dissatisfied with maximum 50% compensation offer.
-    Escalates to human agent with full context.
+    Escalate to human customer care officer with proper handoff
     """
-    print(f"--- Escalating Compensation Dissatisfaction: {customer_complaint} ---")
+    _trace("--- Escalating to Customer Care Officer: %s ---", escalation_reason)
     
-    # Generate escalation reference number
-    escalation_id = f"ESC_{random.randint(10000, 99999)}"
-    
-    # Determine escalation reason
-    complaint_lower = customer_complaint.lower()
-    escalation_reason = "General dissatisfaction"
+    # Generate escalation details
+    escalation_id = _new_id("ESC")
+    current_time = _now_str()
     
-    if any(word in complaint_lower for word in ["not enough", "more money", "full refund", "complete refund"]):
-        escalation_reason = "Requesting compensation above 50% policy limit"
-    elif any(word in complaint_lower for word in ["unfair", "ridiculous", "terrible", "awful"]):
-        escalation_reason = "Customer expressing strong dissatisfaction with policy"
-    elif any(word in complaint_lower for word in ["manager", "supervisor", "human", "person"]):
-        escalation_reason = "Customer specifically requesting human intervention"
-    elif any(word in complaint_lower for word in ["cancel", "never again", "complaint", "report"]):
-        escalation_reason = "Customer threatening to escalate beyond Grab"
+    assigned_officer = _RNG.choice(CARE_OFFICERS)
+    estimated_wait = _RNG.choice(_CARE_WAIT_MINUTES)
     
-    return f"""🚨 ESCALATION TO HUMAN AGENT INITIATED
+    return CARE_ESCALATION_TEMPLATE.format_map({
+        "escalation_id": escalation_id,
+        "current_time": current_time,
+        "escalation_reason": escalation_reason,
+        "officer": assigned_officer,
+        "estimated_wait": estimated_wait,
+    })
+
+
+# Handoff scaffold of escalate_compensation_dissatisfaction, filled with str.format_map
+COMPENSATION_ESCALATION_TEMPLATE = """🚨 ESCALATION TO HUMAN AGENT INITIATED
 
 📋 ESCALATION SUMMARY:
 • Escalation ID: {escalation_id}
@@ -1820,3 +2241,40 @@ Please hold while I transfer you - estimated wait time is 3-5 minutes."
 • Document final resolution for policy review
 
 ⚡ STATUS: Transfer in progress..."""
+
+# (trigger phrases, escalation reason), checked in order against the complaint
+_DISSATISFACTION_REASONS = (
+    (("not enough", "more money", "full refund", "complete refund"),
+     "Requesting compensation above 50% policy limit"),
+    (("unfair", "ridiculous", "terrible", "awful"),
+     "Customer expressing strong dissatisfaction with policy"),
+    (("manager", "supervisor", "human", "person"),
+     "Customer specifically requesting human intervention"),
+    (("cancel", "never again", "complaint", "report"),
+     "Customer threatening to escalate beyond Grab"),
+)
+
+def escalate_compensation_dissatisfaction(customer_complaint: str, attempted_compensation: str = "50% of order value") -> str:
+    """
+    Handle escalation when customer is dissatisfied with maximum 50% compensation offer.
+    Escalates to human agent with full context.
+    """
+    _trace("--- Escalating Compensation Dissatisfaction: %s ---", customer_complaint)
+    
+    # Generate escalation reference number
+    escalation_id = _new_id("ESC_")
+    
+    # Determine escalation reason
+    complaint_lower = customer_complaint.lower()
+    escalation_reason = next(
+        (reason for words, reason in _DISSATISFACTION_REASONS
+         if any(word in complaint_lower for word in words)),
+        "General dissatisfaction",
+    )
+    
+    return COMPENSATION_ESCALATION_TEMPLATE.format_map({
+        "escalation_id": escalation_id,
+        "escalation_reason": escalation_reason,
+        "attempted_compensation": attempted_compensation,
+        "customer_complaint": customer_complaint,
+    })